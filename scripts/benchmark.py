@@ -0,0 +1,480 @@
+"""Benchmark every API route in-process against the in-memory storage engine.
+
+The application is driven through httpx's ASGI transport, so no server or database
+is needed. Each route gets ``--requests`` calls at ``--concurrency``; throughput and
+latency percentiles per route are written to a JSON report. Given a ``--baseline``
+report, routes whose p95 latency or throughput regressed by more than
+``--tolerance`` are listed and the script exits with status 1.
+
+Routes answering with anything but a 2xx or 304 status are listed as failed, they
+are left out of the comparison and the script exits with status 1.
+
+Authentication routes are dominated by bcrypt, lower ``BCRYPT_ROUNDS`` to focus on
+the rest of the request path.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import structlog
+from bson.objectid import ObjectId
+from httpx import ASGITransport, AsyncClient
+
+# the application reads its settings on import
+os.environ["DB_ENGINE"] = "memory"
+os.environ["DB_NAME"] = "benchmark_mini_blog_db"
+
+from mini_blog_api.config import Settings, get_settings
+from mini_blog_api.controllers import (
+    auth_controller,
+    card_controller,
+    category_controller,
+    internal_controller,
+)
+from mini_blog_api.main import create_app
+from mini_blog_api.models.auth_model import UserAuthPayload
+from mini_blog_api.repositories.auth_repository import AuthRepository
+from mini_blog_api.repositories.db import get_db
+from mini_blog_api.repositories.indexes import ensure_indexes
+from mini_blog_api.repositories.memory_engine import MemoryDatabase
+from mini_blog_api.repositories.stats_repository import CardStatsRepository
+from mini_blog_api.services.auth import generate_access_token
+
+settings: Settings = get_settings()
+
+STATUSES = ["draft", "published", "archived", "pending", "featured"]
+
+# Request factory of a route: call number -> (method, url, request kwargs)
+RequestFactory = Callable[[int], Tuple[str, str, Dict[str, Any]]]
+
+
+class Fixture:
+    """Seeded data and the cards reserved for each destructive route."""
+
+    def __init__(self) -> None:
+        self.user_id = ObjectId()
+        self.username = "benchmark"
+        self.password = ""
+        self.category_ids: List[ObjectId] = []
+        self.card_ids: List[ObjectId] = []
+        self.reserved: Dict[str, List[ObjectId]] = {}
+
+
+async def seed(
+    db: MemoryDatabase, categories: int, cards: int, requests: int
+) -> Fixture:
+    fixture = Fixture()
+    created = await AuthRepository.insert_one(
+        UserAuthPayload(username=fixture.username)
+    )
+    fixture.password = created["password"]
+    user = await AuthRepository.find_one(username=fixture.username)
+    fixture.user_id = user.id
+
+    now = datetime.utcnow()
+    fixture.category_ids = [ObjectId() for _ in range(categories)]
+    await db["category"].insert_many(
+        [
+            dict(
+                _id=_id,
+                name=f"category{i}",
+                description=f"Benchmark category {i}",
+                created_at=now,
+                updated_at=now,
+            )
+            for i, _id in enumerate(fixture.category_ids)
+        ]
+    )
+
+    # cards read by every route plus one pool per route that modifies or deletes
+    reserved = ["patch_card", "delete_card", "bulk_status", "bulk_delete"]
+    total = cards + requests * len(reserved) * 10
+    docs = [
+        dict(
+            _id=ObjectId(),
+            name=f"card{i}",
+            status=STATUSES[i % len(STATUSES)],
+            category=fixture.category_ids[i % categories],
+            author=fixture.user_id if i % 4 == 0 else ObjectId(),
+            content=f"Benchmark card {i} about topic{i % 50} and more words",
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(total)
+    ]
+    for doc in docs[cards:]:
+        doc["author"] = fixture.user_id
+    await db["cards"].insert_many(docs)
+
+    fixture.card_ids = [doc["_id"] for doc in docs[:cards]]
+    pool = iter(doc["_id"] for doc in docs[cards:])
+    for name in reserved:
+        fixture.reserved[name] = list(itertools.islice(pool, requests * 10))
+
+    await CardStatsRepository.reconcile()
+    return fixture
+
+
+def scenarios(
+    fixture: Fixture, prefix: str, internal: str
+) -> Dict[str, RequestFactory]:
+    """Request factories by ``"<METHOD> <route template>"``."""
+    card = lambda i: fixture.card_ids[i % len(fixture.card_ids)]  # noqa: E731
+    category = lambda i: fixture.category_ids[  # noqa: E731
+        i % len(fixture.category_ids)
+    ]
+    reserved = fixture.reserved
+
+    def new_card(i: int, batch: str = "") -> Dict[str, Any]:
+        return dict(
+            name=f"new{batch}-{i}",
+            status="draft",
+            category=str(category(i)),
+            content="Created by the benchmark",
+        )
+
+    return {
+        # auth
+        f"POST {prefix}/auth/register": lambda i: (
+            "POST",
+            f"{prefix}/auth/register",
+            dict(json={"username": f"user{i}"}),
+        ),
+        f"POST {prefix}/auth/login": lambda i: (
+            "POST",
+            f"{prefix}/auth/login",
+            dict(data={"username": fixture.username, "password": fixture.password}),
+        ),
+        # categories
+        f"POST {prefix}/categories": lambda i: (
+            "POST",
+            f"{prefix}/categories",
+            dict(json={"name": f"new-category{i}", "description": "benchmark"}),
+        ),
+        f"GET {prefix}/categories/{{category_id}}": lambda i: (
+            "GET",
+            f"{prefix}/categories/{category(i)}",
+            {},
+        ),
+        f"GET {prefix}/categories/{{category_id}}/stats": lambda i: (
+            "GET",
+            f"{prefix}/categories/{category(i)}/stats",
+            {},
+        ),
+        f"GET {prefix}/categories": lambda i: (
+            "GET",
+            f"{prefix}/categories",
+            dict(params={"limit": 20}),
+        ),
+        # cards
+        f"POST {prefix}/cards": lambda i: (
+            "POST",
+            f"{prefix}/cards",
+            dict(json=new_card(i)),
+        ),
+        f"POST {prefix}/cards:bulk": lambda i: (
+            "POST",
+            f"{prefix}/cards:bulk",
+            dict(json={"cards": [new_card(j, f"bulk{i}") for j in range(10)]}),
+        ),
+        f"PATCH {prefix}/cards:bulk": lambda i: (
+            "PATCH",
+            f"{prefix}/cards:bulk",
+            dict(
+                json={
+                    "cards": [
+                        {"id": str(_id), "status": "published"}
+                        for _id in reserved["bulk_status"][i * 10 : i * 10 + 10]
+                    ]
+                }
+            ),
+        ),
+        f"POST {prefix}/cards:bulkDelete": lambda i: (
+            "POST",
+            f"{prefix}/cards:bulkDelete",
+            dict(
+                json={
+                    "ids": [
+                        str(_id)
+                        for _id in reserved["bulk_delete"][i * 10 : i * 10 + 10]
+                    ]
+                }
+            ),
+        ),
+        f"GET {prefix}/cards/export": lambda i: (
+            "GET",
+            f"{prefix}/cards/export",
+            dict(params={"category": str(category(i))}),
+        ),
+        f"GET {prefix}/cards/search": lambda i: (
+            "GET",
+            f"{prefix}/cards/search",
+            dict(params={"q": f"topic{i % 50}", "limit": 20}),
+        ),
+        f"GET {prefix}/cards/stats": lambda i: ("GET", f"{prefix}/cards/stats", {}),
+        f"GET {prefix}/cards/{{card_id}}": lambda i: (
+            "GET",
+            f"{prefix}/cards/{card(i)}",
+            {},
+        ),
+        f"GET {prefix}/cards": lambda i: (
+            "GET",
+            f"{prefix}/cards",
+            dict(params={"limit": 20}),
+        ),
+        f"GET {prefix}/me/cards": lambda i: (
+            "GET",
+            f"{prefix}/me/cards",
+            dict(params={"limit": 20}),
+        ),
+        f"GET {prefix}/users/{{user_id}}/cards": lambda i: (
+            "GET",
+            f"{prefix}/users/{fixture.user_id}/cards",
+            dict(params={"limit": 20}),
+        ),
+        f"PATCH {prefix}/cards/{{card_id}}": lambda i: (
+            "PATCH",
+            f"{prefix}/cards/{reserved['patch_card'][i]}",
+            dict(json={"status": "published"}),
+        ),
+        f"DELETE {prefix}/cards/{{card_id}}": lambda i: (
+            "DELETE",
+            f"{prefix}/cards/{reserved['delete_card'][i]}",
+            {},
+        ),
+        # internal
+        f"GET {internal}/app_info": lambda i: ("GET", f"{internal}/app_info", {}),
+        f"GET {internal}/healthcheck": lambda i: (
+            "GET",
+            f"{internal}/healthcheck",
+            {},
+        ),
+        f"GET {internal}/testing": lambda i: ("GET", f"{internal}/testing", {}),
+        f"GET {internal}/indexes": lambda i: ("GET", f"{internal}/indexes", {}),
+        f"GET {internal}/cache": lambda i: ("GET", f"{internal}/cache", {}),
+        f"POST {internal}/stats/reconcile": lambda i: (
+            "POST",
+            f"{internal}/stats/reconcile",
+            {},
+        ),
+        f"GET {internal}/metrics": lambda i: ("GET", f"{internal}/metrics", {}),
+    }
+
+
+def declared_routes(prefix: str, internal: str) -> List[str]:
+    """``"<METHOD> <route template>"`` of every route of the benchmarked controllers."""
+    routes = []
+    for controller, route_prefix in (
+        (auth_controller, prefix),
+        (category_controller, prefix),
+        (card_controller, prefix),
+        (internal_controller, internal),
+    ):
+        for route in controller.router.routes:
+            for method in sorted(route.methods):
+                routes.append(f"{method} {route_prefix}{route.path}")
+    return routes
+
+
+def succeeded(status_code: int) -> bool:
+    return 200 <= status_code < 300 or status_code == 304
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(q / 100 * len(values) + 0.5) - 1))
+    return values[rank]
+
+
+async def measure(
+    client: AsyncClient,
+    factory: RequestFactory,
+    requests: int,
+    concurrency: int,
+    headers: Dict[str, str],
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    calls = iter(range(requests))
+
+    async def worker() -> None:
+        for i in calls:
+            method, url, kwargs = factory(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, headers=headers, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            code = str(response.status_code)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return dict(
+        requests=requests,
+        failures=sum(n for code, n in status_codes.items() if not succeeded(int(code))),
+        status_codes=status_codes,
+        throughput_rps=round(requests / elapsed, 2) if elapsed else 0.0,
+        latency_ms={
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+    )
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Routes slower or with lower throughput than ``baseline`` beyond ``tolerance``.
+
+    Latencies of failed requests are not comparable, routes with failures in either
+    report are listed instead.
+    """
+    regressions = []
+    for route, result in report["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if before is None:
+            continue
+        if result["failures"] or before.get("failures", before.get("errors")):
+            regressions.append(
+                f"{route}: not comparable, status codes"
+                f" {before['status_codes']} -> {result['status_codes']}"
+            )
+            continue
+        p95, base_p95 = result["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if base_p95 and p95 > base_p95 * (1 + tolerance):
+            regressions.append(f"{route}: p95 {base_p95}ms -> {p95}ms")
+        rps, base_rps = result["throughput_rps"], before["throughput_rps"]
+        if base_rps and rps < base_rps * (1 - tolerance):
+            regressions.append(f"{route}: throughput {base_rps}/s -> {rps}/s")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    app = create_app()
+    db = get_db(settings.db_uri, settings.db_name)
+    await ensure_indexes()
+    fixture = await seed(db, args.categories, args.cards, args.requests)
+
+    prefix, internal = settings.api_prefix, settings.internal_routes_prefix
+    factories = scenarios(fixture, prefix, internal)
+    missing = [
+        route for route in declared_routes(prefix, internal) if route not in factories
+    ]
+    for route in missing:
+        print(f"warning: no benchmark scenario for {route}", file=sys.stderr)
+
+    token = generate_access_token(account=dict(sub=str(fixture.user_id)))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    routes: Dict[str, Any] = {}
+    # app errors are reported as 500s instead of aborting the run
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for route, factory in factories.items():
+            if args.route and not any(pattern in route for pattern in args.route):
+                continue
+            routes[route] = await measure(
+                client, factory, args.requests, args.concurrency, headers
+            )
+            latency = routes[route]["latency_ms"]
+            failures = routes[route]["failures"]
+            print(
+                f"{route:50} {routes[route]['throughput_rps']:>10.1f}/s"
+                f" p50 {latency['p50']:>8.2f}ms p95 {latency['p95']:>8.2f}ms"
+                f" p99 {latency['p99']:>8.2f}ms"
+                + (f" FAILED {failures}/{args.requests}" if failures else ""),
+                file=sys.stderr,
+            )
+
+    return dict(
+        meta=dict(
+            created_at=datetime.utcnow().isoformat(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            cards=args.cards,
+            categories=args.categories,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            unbenchmarked_routes=missing,
+        ),
+        routes=routes,
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    if not args.verbose:
+        structlog.configure(
+            wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+        )
+    report = asyncio.run(run(args))
+    Path(args.output).write_text(json.dumps(report, indent=4))
+
+    failed = [route for route, result in report["routes"].items() if result["failures"]]
+    for route in failed:
+        codes = report["routes"][route]["status_codes"]
+        print(f"failed: {route}: status codes {codes}", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+    return 1 if failed or regressions else 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    args_parser = argparse.ArgumentParser(description="Benchmark the API routes")
+    args_parser.add_argument(
+        "--cards", type=int, default=1000, help="Number of seeded cards"
+    )
+    args_parser.add_argument(
+        "--categories", type=int, default=20, help="Number of seeded categories"
+    )
+    args_parser.add_argument(
+        "--requests", type=int, default=200, help="Requests sent to every route"
+    )
+    args_parser.add_argument(
+        "--concurrency", type=int, default=10, help="Requests in flight per route"
+    )
+    args_parser.add_argument(
+        "--route",
+        action="append",
+        help="Only benchmark routes containing this text, may be repeated",
+    )
+    args_parser.add_argument(
+        "--output", default="benchmark.json", help="JSON report file"
+    )
+    args_parser.add_argument("--baseline", help="JSON report to compare against")
+    args_parser.add_argument(
+        "--verbose", action="store_true", help="Keep the application info logs"
+    )
+    args_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative regression of p95 latency and throughput",
+    )
+    return args_parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
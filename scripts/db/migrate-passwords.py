@@ -0,0 +1,68 @@
+"""Migrate accounts registered before passwords were verified with bcrypt.
+
+Those accounts were handed their stored bcrypt hash as password and logged in by
+plain string comparison. The stored hash is hashed once more, so the password the
+user holds verifies with bcrypt, and the account is marked with the current
+password_version. Accounts carrying password_version are left alone, so the script
+can be run again safely.
+
+Runtime settings are read like the application does, from the environment and .env.
+
+$ poetry run python scripts/db/migrate-passwords.py
+"""
+
+import sys
+from datetime import datetime
+
+import bcrypt
+import structlog
+from pymongo import MongoClient  # type: ignore
+from pymongo.collection import Collection  # type: ignore
+from pymongo.errors import PyMongoError  # type: ignore
+
+from mini_blog_api.config import Settings, get_settings
+from mini_blog_api.repositories.auth_repository import AuthRepository
+
+log = structlog.get_logger()
+
+
+def migrate(collection: Collection, rounds: int) -> int:
+    """Re-hash the stored hash of every legacy account, returns the count."""
+    migrated = 0
+    legacy = {"password_version": {"$exists": False}}
+    for user in collection.find(legacy, {"password": 1}):
+        password = bcrypt.hashpw(
+            user["password"].encode("utf-8"), bcrypt.gensalt(rounds=rounds)
+        ).decode("utf-8")
+        # the stored hash must still be the one the user was handed
+        result = collection.update_one(
+            dict(legacy, _id=user["_id"], password=user["password"]),
+            {
+                "$set": {
+                    "password": password,
+                    "password_version": AuthRepository.password_version,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+        migrated += result.modified_count
+    return migrated
+
+
+def main() -> int:
+    settings: Settings = get_settings()
+    client: MongoClient = MongoClient(settings.db_uri)
+    try:
+        collection = client[settings.db_name]["user_auth"]
+        migrated = migrate(collection, settings.bcrypt_rounds)
+        log.msg("legacy passwords migrated", accounts=migrated)
+        return 0
+    except PyMongoError as error:
+        log.error("password migration failed", error=str(error))
+        return 1
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
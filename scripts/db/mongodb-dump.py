@@ -1,28 +1,64 @@
 """Export MongoDB collections with Rention Policy.
 
 The script will load .env file for runtime settings.
-It will prepare query strings and then invokes mongodump command for the actual data backup.
+By default each collection is exported in one pass in _id order, its raw BSON documents are
+streamed into day partitioned gzip files laid out like mongodump --gzip output, so mongorestore
+reads them as is. DB_BACKUP_EXPORTER=mongodump runs one mongodump per day and collection instead.
+Dump and restore commands run on a pool of DB_BACKUP_WORKERS threads, failed ones are retried
+DB_BACKUP_RETRIES times with exponential backoff, and at most DB_MAX_CONNECTIONS database
+connections are used at any time. Backed up (collection, day) ranges are recorded in a manifest
+in DB_BACKUP_DIR. Archive days are skipped by later runs once the swap pruned them from their
+live collection, retention days still take writes and are dumped on every run. The retention days
+dumped by this run are restored into shadow collections without indexes. Each shadow is synced
+with the writes its live collection took since, by _id and updated_at, indexed, synced again and
+renamed over its live collection, so the API never reads an empty collection. Writes landing
+between the last sync and the rename are lost.
 
 IMPORTANT: The script only uses the db uri env var when connecting and working with the database i.e. db name is implicit.
 """
 
 import dataclasses
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
 import shlex
 import subprocess
+import sys
+import threading
+import time as timer
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, time, timedelta
+from functools import partial
 from os import environ
 from pathlib import Path
-from typing import List, NamedTuple, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
 import bson.json_util  # type: ignore
 import pymongo  # type: ignore
 import pytz
 import structlog
 from bson import ObjectId  # type: ignore
+from bson.codec_options import CodecOptions  # type: ignore
+from bson.raw_bson import RawBSONDocument  # type: ignore
 from dotenv import load_dotenv
+from pymongo import IndexModel, ReplaceOne  # type: ignore
+from pymongo.collection import Collection  # type: ignore
 from pymongo.database import Database  # type: ignore
+from pymongo.errors import PyMongoError  # type: ignore
 from pytz.tzfile import DstTzInfo
-from rfc3339 import rfc3339  # type: ignore
 
 # get env vars from .env file
 load_dotenv()
@@ -39,6 +75,24 @@ DB_URI = "mongodb://localhost:27017/apms_status_db"
 DB_RETENTION_DAYS = 1
 DB_ARCHIVE_DAYS = 180
 DB_BACKUP_DIR = "."
+DB_BACKUP_WORKERS = 4
+DB_BACKUP_RETRIES = 2
+DB_BACKUP_RETRY_BACKOFF = 5.0
+DB_MAX_CONNECTIONS = 8
+DB_BACKUP_EXPORTER = "native"
+DB_EXPORT_BATCH_SIZE = 10000
+# completed backup ranges, in DB_BACKUP_DIR
+MANIFEST_NAME = "backup-manifest.json"
+# manifests of another version are discarded, their days are dumped again
+MANIFEST_VERSION = 2
+# mongodump --gzip output
+EXPORT_COMPRESS_LEVEL = 6
+EXPORT_BUFFER_SIZE = 1 << 20
+DB_RESTORE_INSERTION_WORKERS = 4
+# collections are restored into "<name>__restore" and renamed over the live one
+SHADOW_SUFFIX = "__restore"
+# margin for the clocks of the API hosts when comparing their updated_at stamps
+CLOCK_SKEW = timedelta(minutes=5)
 
 
 class Settings(NamedTuple):
@@ -46,6 +100,13 @@ class Settings(NamedTuple):
     db_retention_days: int
     db_archive_days: int
     db_backup_dir: Path
+    db_backup_workers: int
+    db_backup_retries: int
+    db_backup_retry_backoff: float
+    db_max_connections: int
+    db_backup_exporter: str
+    db_export_batch_size: int
+    db_restore_insertion_workers: int
 
 
 def get_settings() -> Settings:
@@ -54,6 +115,19 @@ def get_settings() -> Settings:
         db_retention_days=int(environ.get("DB_RETENTION_DAYS", DB_RETENTION_DAYS)),
         db_archive_days=int(environ.get("DB_ARCHIVE_DAYS", DB_ARCHIVE_DAYS)),
         db_backup_dir=Path(environ.get("DB_BACKUP_DIR", DB_BACKUP_DIR)),
+        db_backup_workers=int(environ.get("DB_BACKUP_WORKERS", DB_BACKUP_WORKERS)),
+        db_backup_retries=int(environ.get("DB_BACKUP_RETRIES", DB_BACKUP_RETRIES)),
+        db_backup_retry_backoff=float(
+            environ.get("DB_BACKUP_RETRY_BACKOFF", DB_BACKUP_RETRY_BACKOFF)
+        ),
+        db_max_connections=int(environ.get("DB_MAX_CONNECTIONS", DB_MAX_CONNECTIONS)),
+        db_backup_exporter=environ.get("DB_BACKUP_EXPORTER", DB_BACKUP_EXPORTER),
+        db_export_batch_size=int(
+            environ.get("DB_EXPORT_BATCH_SIZE", DB_EXPORT_BATCH_SIZE)
+        ),
+        db_restore_insertion_workers=int(
+            environ.get("DB_RESTORE_INSERTION_WORKERS", DB_RESTORE_INSERTION_WORKERS)
+        ),
     )
     return settings
 
@@ -85,6 +159,11 @@ def retention_timestamp(
     return retention_local
 
 
+def rfc3339(timestamp: datetime) -> str:
+    """RFC 3339 string of an aware timestamp, e.g. 2024-01-10T00:00:00+06:30"""
+    return timestamp.isoformat(timespec="seconds")
+
+
 ### db functions ###
 
 
@@ -120,13 +199,20 @@ def dump_db(
     return r
 
 
-def restore_db(db_uri: str, data_namespace: str, intput_dir: str):
-    mongorestore_cmd = (
-        "mongorestore --uri={db_uri} --nsInclude='{data_namespace}' --gzip {input_dir}"
-    )
+def restore_db(
+    db_uri: str,
+    data_namespace: str,
+    intput_dir: str,
+    target_namespace: str,
+    insertion_workers: int = 1,
+):
+    """Restore the documents of one namespace into ``target_namespace``, no indexes."""
+    mongorestore_cmd = "mongorestore --uri={db_uri} --nsInclude={data_namespace} --nsFrom={data_namespace} --nsTo={target_namespace} --numParallelCollections=1 --numInsertionWorkersPerCollection={insertion_workers} --noIndexRestore --gzip {input_dir}"
     cmd = mongorestore_cmd.format(
         db_uri=shlex.quote(db_uri),
         data_namespace=shlex.quote(data_namespace),
+        target_namespace=shlex.quote(target_namespace),
+        insertion_workers=insertion_workers,
         input_dir=shlex.quote(intput_dir),
     )
     cmd_args: List[str] = shlex.split(cmd)
@@ -137,6 +223,189 @@ def restore_db(db_uri: str, data_namespace: str, intput_dir: str):
     return r
 
 
+def collection_metadata(db: Database, collection_name: str) -> bytes:
+    """Collection options and indexes in the mongodump metadata.json format."""
+    info = next(iter(db.list_collections(filter={"name": collection_name})), {})
+    metadata = dict(
+        indexes=list(db[collection_name].list_indexes()),
+        collectionName=collection_name,
+        type=info.get("type", "collection"),
+        options=info.get("options", {}),
+    )
+    return bson.json_util.dumps(
+        metadata, json_options=bson.json_util.CANONICAL_JSON_OPTIONS
+    ).encode()
+
+
+def export_db(
+    db: Database, collection_name: str, backups: List["BackupTask"], batch_size: int
+) -> ProcessResult:
+    """Stream a collection in _id order into one dump file per backup period.
+
+    Each run of adjacent periods is read by one cursor. Only the current cursor
+    batch and one output file are held at a time. The files are written like
+    mongodump --gzip, ``<output_dir>/<db>/<collection>`` ``.bson.gz`` and
+    ``.metadata.json.gz``, for every given period.
+    """
+    collection = db.get_collection(
+        collection_name, codec_options=CodecOptions(document_class=RawBSONDocument)
+    )
+    exported = 0
+    try:
+        metadata = collection_metadata(db, collection_name)
+        for periods in adjacent_periods(backups):
+            cursor = collection.find(
+                oid_range(periods[0].backup_start, periods[-1].backup_end),
+                sort=[("_id", pymongo.ASCENDING)],
+                batch_size=batch_size,
+            )
+            with cursor:
+                doc = next(cursor, None)
+                for period in periods:
+                    end = ObjectId.from_datetime(period.backup_end)
+                    output_dir = period.output_dir.joinpath(Path(db.name))
+                    output_dir.mkdir(parents=True, exist_ok=True)
+                    output_dir.joinpath(
+                        f"{collection_name}.metadata.json.gz"
+                    ).write_bytes(
+                        gzip.compress(metadata, compresslevel=EXPORT_COMPRESS_LEVEL)
+                    )
+
+                    path = output_dir.joinpath(f"{collection_name}.bson.gz")
+                    with gzip.open(
+                        path, "wb", compresslevel=EXPORT_COMPRESS_LEVEL
+                    ) as f:
+                        out = io.BufferedWriter(f, buffer_size=EXPORT_BUFFER_SIZE)
+                        while doc is not None and doc["_id"] < end:
+                            out.write(doc.raw)
+                            exported += 1
+                            doc = next(cursor, None)
+                        out.flush()
+    except (PyMongoError, OSError) as error:
+        return ProcessResult(out=str(error).encode(), err=None, returncode=1)
+
+    summary = f"{exported} documents exported into {len(backups)} files"
+    return ProcessResult(out=summary.encode(), err=None, returncode=0)
+
+
+def index_models(indexes: Iterable[Dict[str, Any]]) -> List[IndexModel]:
+    """Indexes as listed by listIndexes, to create them on another collection."""
+    models = []
+    for index in indexes:
+        if index["name"] == "_id_":
+            continue
+        keys = []
+        for field, direction in index["key"].items():
+            if field == "_fts":  # text indexes list their fields in the weights
+                keys.extend((text, "text") for text in index.get("weights", {}))
+            elif field != "_ftsx":
+                keys.append((field, direction))
+        options = {k: v for k, v in index.items() if k not in ("v", "key", "ns")}
+        models.append(IndexModel(keys, **options))
+    return models
+
+
+def sync_shadow(
+    live: Collection,
+    shadow: Collection,
+    since: datetime,
+    changed_since: datetime,
+    batch_size: int,
+) -> Tuple[int, int]:
+    """Bring the retention window of a shadow collection up to date with the live one.
+
+    Documents missing from the shadow, changed since ``changed_since`` by their
+    ``updated_at`` or without one are copied over, documents deleted from the live
+    collection are deleted from the shadow. Returns the copied and deleted counts.
+    """
+    window = {"_id": {"$gte": ObjectId.from_datetime(since)}}
+    live_ids = {doc["_id"] for doc in live.find(window, projection={"_id": 1})}
+    shadow_ids = {doc["_id"] for doc in shadow.find(window, projection={"_id": 1})}
+
+    deleted = 0
+    gone = sorted(shadow_ids - live_ids)
+    for i in range(0, len(gone), batch_size):
+        query = {"_id": {"$in": gone[i : i + batch_size]}}
+        deleted += shadow.delete_many(query).deleted_count
+
+    missing = sorted(live_ids - shadow_ids)
+    changed = {
+        "$and": [
+            window,
+            {
+                "$or": [
+                    {"updated_at": {"$gte": changed_since}},
+                    {"updated_at": {"$exists": False}},
+                ]
+            },
+        ]
+    }
+    docs = itertools.chain(
+        *(
+            live.find({"_id": {"$in": missing[i : i + batch_size]}})
+            for i in range(0, len(missing), batch_size)
+        ),
+        (
+            doc
+            for doc in live.find(changed, batch_size=batch_size)
+            if doc["_id"] in shadow_ids
+        ),
+    )
+    copied = 0
+    batch: List[ReplaceOne] = []
+    for doc in docs:
+        batch.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        if len(batch) >= batch_size:
+            shadow.bulk_write(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+    if batch:
+        shadow.bulk_write(batch, ordered=False)
+        copied += len(batch)
+    return copied, deleted
+
+
+def swap_collection(
+    db: Database,
+    collection_name: str,
+    since: datetime,
+    changed_since: datetime,
+    batch_size: int,
+) -> ProcessResult:
+    """Swap the restored shadow of a collection in place of the live one.
+
+    The shadow is synced with the live collection, its indexes are built and it is
+    synced once more for the writes made meanwhile. ``renameCollection`` then
+    replaces the live collection in one step, readers never see it empty. Writes
+    to the live collection between the last sync and the rename are lost.
+    """
+    shadow_name = f"{collection_name}{SHADOW_SUFFIX}"
+    live = db[collection_name]
+    shadow = db[shadow_name]
+    try:
+        if not db.list_collection_names(filter={"name": shadow_name}):
+            db.create_collection(shadow_name)
+
+        synced_at = datetime.now(tz=pytz.utc)
+        copied, deleted = sync_shadow(live, shadow, since, changed_since, batch_size)
+        models = index_models(live.list_indexes())
+        if models:
+            shadow.create_indexes(models)
+        # writes made during the first sync and the index build
+        recopied, redeleted = sync_shadow(
+            live, shadow, since, synced_at - CLOCK_SKEW, batch_size
+        )
+        shadow.rename(collection_name, dropTarget=True)  # renameCollection
+    except PyMongoError as error:
+        return ProcessResult(out=str(error).encode(), err=None, returncode=1)
+
+    summary = (
+        f"{copied} documents copied, {deleted} deleted, {len(models)} indexes built,"
+        f" {recopied} copied and {redeleted} deleted before the rename"
+    )
+    return ProcessResult(out=summary.encode(), err=None, returncode=0)
+
+
 ## utility functions ##
 
 
@@ -154,6 +423,26 @@ class BackupTask(NamedTuple):
     output_dir: Path
 
 
+def oid_range(start: datetime, end: datetime) -> Dict[str, Any]:
+    return {
+        "_id": {
+            "$gte": ObjectId.from_datetime(start),
+            "$lt": ObjectId.from_datetime(end),
+        }
+    }
+
+
+def adjacent_periods(backups: List[BackupTask]) -> List[List[BackupTask]]:
+    """Backup periods in time order, grouped into runs without gaps."""
+    groups: List[List[BackupTask]] = []
+    for b in sorted(backups, key=lambda b: b.backup_start):
+        if groups and groups[-1][-1].backup_end == b.backup_start:
+            groups[-1].append(b)
+        else:
+            groups.append([b])
+    return groups
+
+
 def generate_retention_tasks(
     start_time: datetime, num_days: int = 0, backup_dir: Path = Path(".")
 ):
@@ -196,6 +485,398 @@ def generate_archive_tasks(
         end = start
 
 
+### task scheduler ###
+
+
+class ConnectionLimiter:
+    """Global cap on the database connections used by concurrently running tasks."""
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max(1, max_connections)
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, connections: int) -> int:
+        connections = min(connections, self.max_connections)
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.in_use + connections <= self.max_connections
+            )
+            self.in_use += connections
+        return connections
+
+    def release(self, connections: int):
+        with self.condition:
+            self.in_use -= connections
+            self.condition.notify_all()
+
+
+class Task(NamedTuple):
+    """Command to schedule, ``connections`` is the most it opens to the database."""
+
+    name: str
+    run: Callable[[], ProcessResult]
+    connections: int
+    context: Dict[str, Any]
+    on_success: Optional[Callable[[], None]] = None
+
+
+class TaskResult(NamedTuple):
+    task: Task
+    result: ProcessResult
+    attempts: int
+    elapsed: float
+
+    @property
+    def ok(self) -> bool:
+        return self.result.returncode == 0
+
+
+def run_task(
+    task: Task, limiter: ConnectionLimiter, retries: int, backoff: float
+) -> TaskResult:
+    """Run a task, retried with exponential backoff while it fails."""
+    started = timer.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        connections = limiter.acquire(task.connections)
+        try:
+            result = task.run()
+        except OSError as error:  # e.g. the command is not installed
+            result = ProcessResult(out=None, err=str(error).encode(), returncode=127)
+        finally:
+            limiter.release(connections)
+
+        if result.returncode == 0 and task.on_success is not None:
+            try:
+                task.on_success()
+            except OSError as error:
+                result = ProcessResult(out=str(error).encode(), err=None, returncode=1)
+
+        if result.returncode == 0 or attempt > retries:
+            return TaskResult(task, result, attempt, timer.monotonic() - started)
+
+        delay = backoff * 2 ** (attempt - 1)
+        log.msg(
+            "task failed, retrying",
+            task=task.name,
+            attempt=attempt,
+            returncode=result.returncode,
+            retry_in=delay,
+        )
+        timer.sleep(delay)
+
+
+def run_tasks(
+    phase: str,
+    tasks: List[Task],
+    workers: int,
+    limiter: ConnectionLimiter,
+    retries: int = 0,
+    backoff: float = 0.0,
+) -> List[TaskResult]:
+    """Run tasks on a pool of ``workers`` threads, logging progress and a summary."""
+    started = timer.monotonic()
+    results: List[TaskResult] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(run_task, task, limiter, retries, backoff) for task in tasks
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            r: TaskResult = future.result()
+            results.append(r)
+            log.msg(
+                f"{phase} {'successful' if r.ok else 'failed'}",
+                progress=f"{done}/{len(tasks)}",
+                attempts=r.attempts,
+                elapsed=round(r.elapsed, 3),
+                output=(r.result.out or b"").decode(errors="replace")[-500:]
+                if not r.ok
+                else None,
+                **r.task.context,
+            )
+
+    failed = [r for r in results if not r.ok]
+    log.msg(
+        f"{phase} summary",
+        tasks=len(results),
+        succeeded=len(results) - len(failed),
+        failed=len(failed),
+        retried=sum(1 for r in results if r.attempts > 1),
+        elapsed=round(timer.monotonic() - started, 3),
+        failed_tasks=",".join(sorted(r.task.name for r in failed)) or None,
+    )
+    return results
+
+
+### backup manifest ###
+
+
+def file_checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(EXPORT_BUFFER_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dump_stats(path: Path) -> Tuple[int, Optional[ObjectId]]:
+    """Count and largest _id of the documents in a gzip BSON dump file."""
+    count, last_id = 0, None
+    raw = CodecOptions(document_class=RawBSONDocument)
+    with gzip.open(path, "rb") as f:
+        for doc in bson.decode_file_iter(f, codec_options=raw):
+            count += 1
+            if last_id is None or doc["_id"] > last_id:
+                last_id = doc["_id"]
+    return count, last_id
+
+
+class PendingBackup(NamedTuple):
+    collection: str
+    period: BackupTask
+    count: int
+    last_id: Optional[ObjectId]
+    # the day is older than the retention window, pruned from the live collection
+    final: bool
+
+
+class BackupManifest:
+    """Checkpoints of the (collection, day) ranges already backed up.
+
+    Kept as JSON in DB_BACKUP_DIR and rewritten after every finished task, so an
+    interrupted run resumes where it stopped. Entries hold the count and last _id
+    of the documents in the dump file. Archive days are marked complete once the
+    swap of their collection pruned them from the live collection, they cannot
+    change anymore and are skipped by later runs while their file is intact. Until
+    then, and for retention days which still receive updates and deletes, they are
+    dumped again on every run.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            data = json.loads(path.read_text())
+            if data.get("version") == MANIFEST_VERSION:
+                self.entries = data.get("entries", {})
+
+    @staticmethod
+    def key(db_name: str, collection_name: str, period: BackupTask) -> str:
+        return f"{db_name}.{collection_name}/{period.backup_start.strftime('%Y%m%d')}"
+
+    def get(
+        self, db_name: str, collection_name: str, period: BackupTask
+    ) -> Optional[Dict[str, Any]]:
+        return self.entries.get(self.key(db_name, collection_name, period))
+
+    def completed(self, db_name: str, collection_name: str, period: BackupTask) -> bool:
+        entry = self.get(db_name, collection_name, period)
+        if entry is None or not entry["complete"]:
+            return False
+        if entry["count"] == 0:
+            return True
+        path = self.path.parent.joinpath(entry["path"])
+        if path.exists() and path.stat().st_size == entry["size"]:
+            return True
+        log.warning("backup file missing or changed, dumping again", file=str(path))
+        return False
+
+    def record(
+        self, db_name: str, backups: List[PendingBackup], now: datetime, save=True
+    ):
+        """Checkpoint backed up ranges with what their dump files hold, not complete."""
+        entries = {}
+        for b in backups:
+            path = b.period.output_dir.joinpath(
+                Path(db_name), f"{b.collection}.bson.gz"
+            )
+            exists = path.exists()
+            count, last_id = dump_stats(path) if exists else (0, None)
+            entries[self.key(db_name, b.collection, b.period)] = dict(
+                start=rfc3339(b.period.backup_start),
+                end=rfc3339(b.period.backup_end),
+                count=count,
+                last_id=str(last_id) if last_id else None,
+                path=os.path.relpath(path.absolute(), self.path.parent.absolute())
+                if exists
+                else None,
+                size=path.stat().st_size if exists else 0,
+                sha256=file_checksum(path) if exists else None,
+                complete=False,
+                backed_up_at=rfc3339(now),
+            )
+        with self.lock:
+            self.entries.update(entries)
+            if save:
+                self.save()
+
+    def complete(self, db_name: str, collection_name: str, periods: List[BackupTask]):
+        """Mark the archive days of a collection complete after its swap pruned them."""
+        with self.lock:
+            for period in periods:
+                entry = self.get(db_name, collection_name, period)
+                if entry is not None:
+                    entry["complete"] = True
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                dict(version=MANIFEST_VERSION, entries=self.entries),
+                indent=2,
+                sort_keys=True,
+            )
+        )
+        tmp.replace(self.path)
+
+
+def plan_backups(
+    db: Database,
+    manifest: BackupManifest,
+    backups: List[BackupTask],
+    collection_names: List[str],
+    now: datetime,
+    retention_cutoff: datetime,
+) -> List[PendingBackup]:
+    """Ranges to back up, without empty ones and checkpointed archive days."""
+    pending: List[PendingBackup] = []
+    empty: List[PendingBackup] = []
+    skipped = 0
+    for cn in collection_names:
+        for period in backups:
+            final = period.backup_end <= retention_cutoff
+            if final and manifest.completed(db.name, cn, period):
+                skipped += 1
+                continue
+
+            # indexed _id range count, cheap compared to a dump
+            query = oid_range(period.backup_start, period.backup_end)
+            count = db[cn].count_documents(query)
+            if count == 0:
+                empty.append(PendingBackup(cn, period, 0, None, final))
+                continue
+            last = db[cn].find_one(
+                query, projection={"_id": 1}, sort=[("_id", pymongo.DESCENDING)]
+            )
+            pending.append(
+                PendingBackup(cn, period, count, last and last["_id"], final)
+            )
+
+    manifest.record(db.name, empty, now)
+    log.msg(
+        "backup planned",
+        pending=len(pending),
+        empty=len(empty),
+        skipped=skipped,
+        documents=sum(b.count for b in pending),
+    )
+    return pending
+
+
+def dump_tasks(
+    pending: List[PendingBackup],
+    db_name: str,
+    manifest: BackupManifest,
+    now: datetime,
+) -> Iterator[Task]:
+    """One mongodump task per pending backup range."""
+    for b in pending:
+        output_dir = str(b.period.output_dir.absolute())
+        yield Task(
+            name=f"{b.period.backup_task}-{b.collection}",
+            run=partial(
+                dump_db,
+                settings.db_uri,
+                db_name,
+                b.collection,
+                bson.json_util.dumps(
+                    oid_range(b.period.backup_start, b.period.backup_end)
+                ),
+                output_dir,
+            ),
+            connections=1,
+            context=dict(
+                backup_start=rfc3339(b.period.backup_start),
+                backup_end=rfc3339(b.period.backup_end),
+                backup_task=b.period.backup_task,
+                collection=b.collection,
+                documents=b.count,
+                output_dir=output_dir,
+            ),
+            on_success=partial(manifest.record, db_name, [b], now),
+        )
+
+
+def export_tasks(
+    pending: List[PendingBackup],
+    db: Database,
+    manifest: BackupManifest,
+    now: datetime,
+) -> Iterator[Task]:
+    """One native export task per collection, covering its pending ranges."""
+    by_collection: Dict[str, List[PendingBackup]] = {}
+    for b in pending:
+        by_collection.setdefault(b.collection, []).append(b)
+
+    for cn, backups in by_collection.items():
+        periods = [b.period for b in backups]
+        yield Task(
+            name=f"export-{cn}",
+            run=partial(export_db, db, cn, periods, settings.db_export_batch_size),
+            connections=1,
+            context=dict(
+                backup="export",
+                backup_start=rfc3339(min(p.backup_start for p in periods)),
+                backup_end=rfc3339(max(p.backup_end for p in periods)),
+                backup_periods=len(periods),
+                collection=cn,
+                documents=sum(b.count for b in backups),
+            ),
+            on_success=partial(manifest.record, db.name, backups, now),
+        )
+
+
+def restore_tasks(pending: List[PendingBackup], db_name: str) -> Iterator[Task]:
+    """Restore tasks for the retention ranges dumped by this run into the shadows.
+
+    Retention days are never skipped by the planner, so every one of them holding
+    documents was dumped by this run, files of earlier runs are not restored.
+    """
+    insertion_workers = min(
+        settings.db_restore_insertion_workers, settings.db_max_connections
+    )
+    for b in pending:
+        if b.final:
+            continue
+        data_namespace = f"{db_name}.{b.collection}"
+        input_dir = str(b.period.output_dir.joinpath(db_name).absolute())
+        yield Task(
+            name=f"{b.period.backup_task}-{b.collection}",
+            run=partial(
+                restore_db,
+                settings.db_uri,
+                data_namespace,
+                input_dir,
+                f"{data_namespace}{SHADOW_SUFFIX}",
+                insertion_workers,
+            ),
+            connections=insertion_workers,
+            context=dict(
+                collection=b.collection,
+                data_namespace=data_namespace,
+                restore_start=rfc3339(b.period.backup_start),
+                restore_end=rfc3339(b.period.backup_end),
+                restore_task=b.period.backup_task,
+                backup_dir=input_dir,
+            ),
+        )
+
+
 settings: Settings = get_settings()
 
 
@@ -228,94 +909,80 @@ def main():
         retention_cutoff, settings.db_retention_days, backup_dir
     )
 
-    archive_backup = generate_archive_tasks(
-        retention_cutoff, settings.db_archive_days, backup_dir
+    archive_backup = list(
+        generate_archive_tasks(retention_cutoff, settings.db_archive_days, backup_dir)
     )
 
-    for r in retention_backup:
-        subtask_id = 0
-        for cn in collection_names:
-            oid_range = {
-                "_id": {
-                    "$gte": ObjectId.from_datetime(r.backup_start),
-                    "$lt": ObjectId.from_datetime(r.backup_end),
-                }
-            }
-            p = dump_db(
-                settings.db_uri,
-                db.name,
-                cn,
-                bson.json_util.dumps(oid_range),
-                str(r.output_dir.absolute()),
-            )
-            if p.returncode == 0:
-                msg = "retention backup successful"
-            else:
-                msg = "retention backup failed"
-
-            log.msg(
-                msg,
-                backup_start=rfc3339(r.backup_start),
-                backup_end=rfc3339(r.backup_end),
-                backup_task=f"{r.backup_task}-{subtask_id}",
-                collection=cn,
-                output_dir=str(r.output_dir.absolute()),
-            )
+    manifest = BackupManifest(settings.db_backup_dir / MANIFEST_NAME)
+    pending = plan_backups(
+        db,
+        manifest,
+        list(retention_backup) + archive_backup,
+        collection_names,
+        now,
+        retention_cutoff,
+    )
 
-    for a in archive_backup:
-        subtask_id = 0
-        for cn in collection_names:
-            oid_range = {
-                "_id": {
-                    "$gte": ObjectId.from_datetime(a.backup_start),
-                    "$lt": ObjectId.from_datetime(a.backup_end),
-                }
-            }
-            p = dump_db(
-                settings.db_uri,
-                db.name,
-                cn,
-                bson.json_util.dumps(oid_range),
-                str(a.output_dir.absolute()),
-            )
-            if p.returncode == 0:
-                msg = "archive backup successful"
-            else:
-                msg = "archive backup failed"
-            log.msg(
-                msg,
-                backup_start=rfc3339(a.backup_start),
-                backup_end=rfc3339(a.backup_end),
-                backup_task=f"{a.backup_task}-{subtask_id}",
-                collection=cn,
-                output_dir=str(a.output_dir.absolute()),
-            )
+    limiter = ConnectionLimiter(settings.db_max_connections)
+    if settings.db_backup_exporter == "mongodump":
+        backup_tasks = list(dump_tasks(pending, db.name, manifest, now))
+    else:
+        backup_tasks = list(export_tasks(pending, db, manifest, now))
+    backup_results = run_tasks(
+        "backup",
+        backup_tasks,
+        settings.db_backup_workers,
+        limiter,
+        settings.db_backup_retries,
+        settings.db_backup_retry_backoff,
+    )
+    if not all(r.ok for r in backup_results):
+        log.error("backup incomplete, collections are not dropped", db_name=db.name)
+        return 1
 
+    # shadows left behind by an interrupted run
     for cn in collection_names:
-        db.drop_collection(cn)
-        log.msg("dropped collection", db_name=db.name, collection_name=cn)
-
-    retention_backup = generate_retention_tasks(
-        retention_cutoff, settings.db_retention_days, backup_dir
+        db.drop_collection(f"{cn}{SHADOW_SUFFIX}")
+
+    restore_results = run_tasks(
+        "backup restoration",
+        list(restore_tasks(pending, db.name)),
+        settings.db_backup_workers,
+        limiter,
+        settings.db_backup_retries,
+        settings.db_backup_retry_backoff,
     )
-
-    for r in retention_backup:
-        data_namespace = f"{db.name}.*"
-        input_dir = r.output_dir.joinpath(Path(db.name))
-        p = restore_db(settings.db_uri, data_namespace, str(input_dir.absolute()))
-        if p.returncode == 0:
-            msg = "backup restoration successful"
-        else:
-            msg = "backup restoration failed"
-        log.msg(
-            msg,
-            data_namespace=data_namespace,
-            restore_start=rfc3339(r.backup_start),
-            restore_end=rfc3339(r.backup_end),
-            restore_task=r.backup_task,
-            backup_dir=str(input_dir.absolute()),
-        )
+    failed = {r.task.context["collection"] for r in restore_results if not r.ok}
+    for cn in sorted(failed):
+        log.error("collection restore failed, live collection kept", collection=cn)
+
+    swap_results = run_tasks(
+        "collection swap",
+        [
+            Task(
+                name=f"swap-{cn}",
+                run=partial(
+                    swap_collection,
+                    db,
+                    cn,
+                    retention_cutoff,
+                    # the restored dumps were read after the run started
+                    now - CLOCK_SKEW,
+                    settings.db_export_batch_size,
+                ),
+                connections=1,
+                context=dict(collection=cn, shadow=f"{cn}{SHADOW_SUFFIX}"),
+                # its archive days are gone from the live collection now
+                on_success=partial(manifest.complete, db.name, cn, archive_backup),
+            )
+            for cn in collection_names
+            if cn not in failed
+        ],
+        settings.db_backup_workers,
+        limiter,
+    )
+    return 0 if not failed and all(r.ok for r in swap_results) else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List
+from typing import List, Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -20,16 +20,142 @@ class Settings(BaseSettings):
         description="The response content for healthcheck requests",
     )
     api_prefix: str = Field(default="/api/v1", title="API Prefix")
+    db_engine: Literal["mongodb", "memory"] = Field(
+        default="mongodb",
+        title="DB Engine",
+        description="Storage backend, memory keeps every collection in the process",
+    )
     db_uri: str = Field(default="mongodb://localhost:27017/", title="Database URI")
     db_name: str = Field(default="mini_blog_db", title="DB Name")
+    db_max_pool_size: int = Field(
+        default=100, title="DB Max Pool Size", description="maxPoolSize"
+    )
+    db_min_pool_size: int = Field(
+        default=10,
+        title="DB Min Pool Size",
+        description="minPoolSize, also the number of connections opened at startup",
+    )
+    db_max_idle_time_ms: Optional[int] = Field(
+        default=None, title="DB Max Idle Time", description="maxIdleTimeMS"
+    )
+    db_wait_queue_timeout_ms: Optional[int] = Field(
+        default=2000,
+        title="DB Wait Queue Timeout",
+        description="waitQueueTimeoutMS, how long a request waits for a free connection",
+    )
+    db_compressors: str = Field(
+        default="",
+        title="DB Compressors",
+        description="Comma separated wire compressors, e.g. zstd,snappy,zlib",
+    )
+    db_server_selection_timeout_ms: int = Field(
+        default=5000,
+        title="DB Server Selection Timeout",
+        description="serverSelectionTimeoutMS, must outlast a primary election",
+    )
+    db_connect_timeout_ms: int = Field(
+        default=5000, title="DB Connect Timeout", description="connectTimeoutMS"
+    )
+    db_socket_timeout_ms: Optional[int] = Field(
+        default=None, title="DB Socket Timeout", description="socketTimeoutMS"
+    )
+    max_page_skip: int = Field(
+        default=1000,
+        title="Maximum Page Skip",
+        description="Largest skip accepted by list endpoints, use cursor to page deeper",
+    )
+    bulk_max_items: int = Field(
+        default=1000,
+        title="Bulk Max Items",
+        description="Largest number of items accepted by one bulk card request",
+    )
+    export_batch_size: int = Field(
+        default=500,
+        title="Export Batch Size",
+        description="Documents fetched per cursor batch and written per chunk by exports",
+    )
+    category_cache_size: int = Field(
+        default=1024, title="Category Cache Size", description="Cached category reads"
+    )
+    category_cache_ttl: float = Field(
+        default=60.0,
+        title="Category Cache TTL",
+        description="Seconds a cached category read is served before reloading",
+    )
+    category_cache_preload: bool = Field(
+        default=False,
+        title="Category Cache Preload",
+        description="Load categories into the cache at application startup",
+    )
+    cache_control: str = Field(
+        default="private, no-cache",
+        title="Cache-Control",
+        description="Cache-Control header of cacheable GET responses",
+    )
+    response_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        title="Response Cache Max Bytes",
+        description="Total size of the cached list response bodies, 0 disables the cache",
+    )
+    response_cache_ttl: float = Field(
+        default=5.0,
+        title="Response Cache TTL",
+        description="Seconds a cached list response is served before querying again",
+    )
+    response_cache_gzip: bool = Field(
+        default=True,
+        title="Response Cache Gzip",
+        description="Also store a gzip compressed body of large cached responses",
+    )
+    batch_loader_window: float = Field(
+        default=0.0,
+        title="Batch Loader Window",
+        description="Seconds by-id lookups wait to be batched, 0 batches one loop iteration",
+    )
+    batch_loader_max_size: int = Field(
+        default=100,
+        title="Batch Loader Max Size",
+        description="Most ids resolved by one batched lookup query",
+    )
+    search_fallback_max_docs: int = Field(
+        default=10000,
+        title="Search Fallback Max Docs",
+        description="Most cards scanned by text search when no text index exists",
+    )
+    card_stats_reconcile_interval: float = Field(
+        default=3600.0,
+        title="Card Stats Reconcile Interval",
+        description="Seconds between recounts of the card statistics, 0 disables them",
+    )
     password_length: int = Field(default=12, title="Random generate password length")
+    bcrypt_rounds: int = Field(
+        default=12, title="Bcrypt Cost", description="log2 rounds of password hashes"
+    )
+    auth_workers: int = Field(
+        default=4, title="Auth Workers", description="Threads hashing passwords"
+    )
+    auth_queue_limit: int = Field(
+        default=64,
+        title="Auth Queue Limit",
+        description="Password hashes allowed to wait for a worker before 503",
+    )
     jwt_secret: str = Field(default="miniblogtokensecret", title="JWT Token Secret")
     jwt_alg: str = Field(default="HS256", title="JWT Algorithm")
     token_exp: int = Field(default=300, title="Token Expiration")
     routes_to_exclude: str = Field(
-        default="/auth/register,/auth/login",
+        default="/api/v1/auth/register,/api/v1/auth/login,/internal/metrics",
         title="Default routes to exclude in middleware",
     )
+    metrics_token: str = Field(
+        default="",
+        title="Metrics Scrape Token",
+        description="Static bearer token required to scrape /metrics, empty leaves it open",
+    )
+    token_cache_size: int = Field(
+        default=4096,
+        title="Token Cache Size",
+        description="Maximum number of verified JWTs kept by the authorization middleware",
+    )
 
     class Config:
         env_file = ".env"
@@ -19,7 +19,7 @@ router = APIRouter(
 
 @router.post("/auth/register", responses=default_responses)
 async def register_user(user: UserAuthPayload):
-    existing_user = await AuthRepository.find_one(**dict(name=user.username))
+    existing_user = await AuthRepository.find_one(**dict(username=user.username))
 
     if existing_user:
         raise HTTPException(status_code=403, detail="Username already exists.")
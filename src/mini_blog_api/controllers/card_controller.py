@@ -1,14 +1,41 @@
-from typing import Any, Dict, List
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import structlog
 from bson.objectid import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 
 from ..config import Settings, get_settings
 from ..models.base_model import default_responses
-from ..models.card_model import Card, CardPayload, CardQueryParams
+from ..models.card_model import (
+    BulkItemResult,
+    BulkResult,
+    Card,
+    CardBulkCreatePayload,
+    CardBulkDeletePayload,
+    CardBulkStatusPayload,
+    CardExportParams,
+    CardFeedParams,
+    CardPayload,
+    CardQueryParams,
+    CardSearchParams,
+    CardStats,
+)
 from ..repositories.card_repository import CardRepository
 from ..repositories.category_repository import CategoryRepository
+from ..repositories.stats_repository import ALL_CARDS, CardStatsRepository
+from ..responses import JSONBytesResponse, conditional_response
+from ..services.response_cache import response_cache
+from ..services.serializer import dumps
+from ..services.util import (
+    encode_cursor,
+    field_projection,
+    keyset_after,
+    next_page_cursor,
+    page_after,
+)
 
 log = structlog.get_logger()
 settings: Settings = get_settings()
@@ -25,13 +52,15 @@ async def create_card(
     request: Request,
     card: CardPayload,
 ):
-    existing_card = await CardRepository.find_one(**dict(name=card.name))
+    # The unique name index still guards against a card created in between.
+    existing_card, category = await asyncio.gather(
+        CardRepository.find_one(**dict(name=card.name)),
+        CategoryRepository.find_one(**dict(_id=ObjectId(card.category))),
+    )
 
     if existing_card:
         raise HTTPException(status_code=403, detail="card already exists.")
 
-    category = await CategoryRepository.find_one(**dict(_id=ObjectId(card.category)))
-
     if not category:
         raise HTTPException(status_code=404, detail="Category not found.")
 
@@ -44,33 +73,334 @@ async def create_card(
     raise HTTPException(status_code=201, detail=resp)
 
 
-@router.get("/cards/{card_id}", response_model=Card)
-async def get_card_by_id(card_id: str):
-    card_dict: Card = await CardRepository.find_one(**dict(_id=ObjectId(card_id)))
-    if card_dict:
-        return card_dict
+def check_bulk_size(items: List[Any]) -> None:
+    if not 0 < len(items) <= settings.bulk_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bulk requests take 1 to {settings.bulk_max_items} items.",
+        )
+
+
+def bulk_result(results: List[BulkItemResult]) -> BulkResult:
+    succeeded = sum(1 for result in results if result.status_code < 400)
+    return BulkResult(
+        succeeded=succeeded, failed=len(results) - succeeded, results=results
+    )
+
+
+def object_ids(values: List[str]) -> List[Optional[ObjectId]]:
+    return [ObjectId(value) if ObjectId.is_valid(value) else None for value in values]
+
+
+def query_object_id(value: str, name: str) -> ObjectId:
+    """Parse an id query parameter, answering 400 instead of failing on bad input."""
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {name} id.")
+    return ObjectId(value)
+
+
+@router.post("/cards:bulk", response_model=BulkResult)
+async def create_cards(request: Request, payload: CardBulkCreatePayload):
+    """Create many cards with one category lookup and one unordered insert."""
+    check_bulk_size(payload.cards)
+
+    category_ids = object_ids([card.category for card in payload.cards])
+    categories = await CategoryRepository.existing_ids(
+        list({_id for _id in category_ids if _id is not None})
+    )
+
+    results: Dict[int, BulkItemResult] = {}
+    valid: List[int] = []
+    for index, category_id in enumerate(category_ids):
+        if category_id is None:
+            results[index] = BulkItemResult(
+                index=index, status_code=400, detail="Invalid category id."
+            )
+        elif category_id not in categories:
+            results[index] = BulkItemResult(
+                index=index, status_code=404, detail="Category not found."
+            )
+        else:
+            valid.append(index)
+
+    if valid:
+        inserted_ids, errors = await CardRepository.insert_many(
+            [payload.cards[index] for index in valid], request.state.user
+        )
+        for position, index in enumerate(valid):
+            if position in errors:
+                status_code, detail = errors[position]
+                results[index] = BulkItemResult(
+                    index=index, status_code=status_code, detail=detail
+                )
+            else:
+                results[index] = BulkItemResult(
+                    index=index,
+                    card_id=str(inserted_ids[position]),
+                    status_code=201,
+                )
+
+    return bulk_result([results[index] for index in range(len(payload.cards))])
+
+
+@router.patch("/cards:bulk", response_model=BulkResult)
+async def update_cards_status(request: Request, payload: CardBulkStatusPayload):
+    """Change the status of many cards of the current user in one bulk write."""
+    check_bulk_size(payload.cards)
+
+    card_ids = object_ids([change.id for change in payload.cards])
+    valid = [index for index, card_id in enumerate(card_ids) if card_id is not None]
+    ownership, errors = await CardRepository.update_status_many(
+        [(card_ids[index], payload.cards[index].status) for index in valid],
+        request.state.user,
+    )
+    failed = {valid[position]: error for position, error in errors.items()}
+
+    results: List[BulkItemResult] = []
+    for index, (card_id, change) in enumerate(zip(card_ids, payload.cards)):
+        if index in failed:
+            status_code, detail = failed[index]
+            results.append(
+                BulkItemResult(
+                    index=index,
+                    card_id=change.id,
+                    status_code=status_code,
+                    detail=detail,
+                )
+            )
+        else:
+            results.append(
+                ownership_result(index, change.id, card_id, ownership, "updated")
+            )
+    return bulk_result(results)
+
+
+@router.post("/cards:bulkDelete", response_model=BulkResult)
+async def delete_cards(request: Request, payload: CardBulkDeletePayload):
+    """Delete many cards of the current user in one write."""
+    check_bulk_size(payload.ids)
+
+    card_ids = object_ids(payload.ids)
+    ownership = await CardRepository.delete_many(
+        [card_id for card_id in card_ids if card_id is not None], request.state.user
+    )
+
+    return bulk_result(
+        [
+            ownership_result(index, value, card_id, ownership, "deleted")
+            for index, (card_id, value) in enumerate(zip(card_ids, payload.ids))
+        ]
+    )
+
+
+def ownership_result(
+    index: int,
+    value: str,
+    card_id: Optional[ObjectId],
+    ownership: Dict[ObjectId, int],
+    action: str,
+) -> BulkItemResult:
+    if card_id is None:
+        return BulkItemResult(
+            index=index, card_id=value, status_code=400, detail="Invalid card id."
+        )
+
+    status_code = ownership[card_id]
+    detail = {
+        200: f"Card is {action}.",
+        403: "You are unauthorized to edit this card",
+        404: "Card not found.",
+    }[status_code]
+    return BulkItemResult(
+        index=index, card_id=value, status_code=status_code, detail=detail
+    )
+
+
+@router.get(
+    "/cards/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def export_cards(query_params: CardExportParams = Depends()):
+    """Stream matching cards as newline delimited JSON with flat memory usage."""
+    query_filter: Dict[str, Any] = {}
+
+    if query_params.name:
+        query_filter["name"] = query_params.name
+
+    if query_params.status:
+        query_filter["status"] = query_params.status
+
+    if query_params.category:
+        query_filter["category"] = query_object_id(query_params.category, "category")
+
+    return StreamingResponse(
+        ndjson_chunks(query_filter, settings.export_batch_size),
+        media_type="application/x-ndjson",
+    )
+
+
+async def ndjson_chunks(
+    query_filter: Dict[str, Any], batch_size: int
+) -> AsyncIterator[bytes]:
+    lines: List[bytes] = []
+    async for doc in CardRepository.stream(query_filter, batch_size):
+        lines.append(dumps(doc))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+@router.get("/cards/search", responses=default_responses)
+async def search_cards(query_params: CardSearchParams = Depends()):
+    """Cards matching the ``q`` terms in their name or content, best match first."""
+    query_filter: Dict[str, Any] = {}
+
+    if query_params.status:
+        query_filter["status"] = query_params.status
+
+    if query_params.category:
+        query_filter["category"] = query_object_id(query_params.category, "category")
+
+    if not query_params.limit or query_params.limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive.")
+
+    docs = await CardRepository.search(
+        query_params.q,
+        query_filter,
+        limit=query_params.limit,
+        after=search_after(query_params.cursor),
+    )
+
+    if not docs:
+        raise HTTPException(status_code=404, detail="Cards not found")
+
+    next_cursor = None
+    if len(docs) == query_params.limit:
+        next_cursor = encode_cursor(docs[-1]["score"], docs[-1]["_id"])
+
+    return JSONBytesResponse({"cards": docs, "next_cursor": next_cursor})
+
+
+def search_after(cursor: Optional[str]) -> Optional[Tuple[float, ObjectId]]:
+    """Resolve a search cursor to the ``(score, _id)`` of the last seen match."""
+    values = keyset_after(cursor, (int, float), ObjectId)
+    if values is None:
+        return None
+    score, last_id = values
+    return float(score), last_id
+
+
+@router.get("/cards/stats", response_model=CardStats)
+async def get_card_stats():
+    """Number of cards in total and per status, read from the maintained counters."""
+    return await CardStatsRepository.find_one(ALL_CARDS)
+
+
+@router.get("/cards/{card_id}", response_model=Card, response_model_exclude_unset=True)
+async def get_card_by_id(request: Request, card_id: str, fields: Optional[str] = None):
+    # Stored cards are trusted, so the document is encoded without validation.
+    card_doc = await CardRepository.find_one_raw(
+        projection=field_projection(Card, fields), **dict(_id=ObjectId(card_id))
+    )
+    if card_doc:
+        updated_at = card_doc.get("updated_at")
+        return conditional_response(
+            request,
+            card_doc,
+            version=(card_doc["_id"], updated_at) if updated_at else None,
+            last_modified=updated_at,
+        )
     else:
         raise HTTPException(status_code=404, detail="Category not found")
 
 
 @router.get("/cards", responses=default_responses)
-async def get_card_list(query_params: CardQueryParams = Depends()):
+async def get_card_list(request: Request, query_params: CardQueryParams = Depends()):
+    # Keyed before the query, so a concurrent write leaves this entry stale.
+    cache_key = response_cache.key(request, CardRepository.generation)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached.response(request, hit=True)
+
     query_filter: Dict[str, Any] = {}
 
     if query_params.id:
-        query_filter["_id"] = ObjectId(query_params.id)
+        query_filter["_id"] = query_object_id(query_params.id, "card")
 
     if query_params.name:
         query_filter["name"] = query_params.name
 
-    docs: List[Card] = await CardRepository.find(
-        query_filter=query_filter, skip=query_params.skip, limit=query_params.limit
+    if not 0 <= query_params.skip <= settings.max_page_skip:
+        raise HTTPException(
+            status_code=400,
+            detail=f"skip must be between 0 and {settings.max_page_skip}, use cursor to page further.",
+        )
+
+    after = page_after(query_params.cursor)
+
+    docs: List[Dict[str, Any]] = await CardRepository.find_raw(
+        query_filter=query_filter,
+        skip=query_params.skip,
+        limit=query_params.limit,
+        projection=field_projection(Card, query_params.fields),
+        after=after,
     )
 
     if not docs:
         raise HTTPException(status_code=404, detail="Cards not found")
 
-    return {"cards": docs}
+    return response_cache.set(
+        cache_key,
+        {"cards": docs, "next_cursor": next_page_cursor(docs, query_params.limit)},
+    ).response(request, hit=False)
+
+
+@router.get("/me/cards", responses=default_responses)
+async def get_my_cards(request: Request, query_params: CardFeedParams = Depends()):
+    """Cards of the current user, newest first."""
+    return await author_feed(request, ObjectId(request.state.user), query_params)
+
+
+@router.get("/users/{user_id}/cards", responses=default_responses)
+async def get_user_cards(
+    request: Request, user_id: str, query_params: CardFeedParams = Depends()
+):
+    """Cards of a user, newest first."""
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user id.")
+
+    return await author_feed(request, ObjectId(user_id), query_params)
+
+
+async def author_feed(
+    request: Request, author: ObjectId, query_params: CardFeedParams
+) -> Response:
+    if not query_params.limit or query_params.limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive.")
+
+    projection = field_projection(Card, query_params.fields)
+    if projection:
+        projection["created_at"] = 1  # needed for the next page cursor
+
+    docs: List[Dict[str, Any]] = await CardRepository.find_by_author(
+        author,
+        limit=query_params.limit,
+        projection=projection,
+        after=keyset_after(query_params.cursor, datetime, ObjectId),
+    )
+
+    if not docs:
+        raise HTTPException(status_code=404, detail="Cards not found")
+
+    next_cursor = None
+    if len(docs) == query_params.limit:
+        next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"])
+
+    return conditional_response(request, {"cards": docs, "next_cursor": next_cursor})
 
 
 @router.patch("/cards/{card_id}")
@@ -1,13 +1,18 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import structlog
 from bson.objectid import ObjectId
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
 from ..config import Settings, get_settings
 from ..models.base_model import default_responses
+from ..models.card_model import CardStats
 from ..models.category_model import Category, CategoryPayload, CategoryQueryParams
 from ..repositories.category_repository import CategoryRepository
+from ..repositories.stats_repository import CardStatsRepository
+from ..responses import conditional_response
+from ..services.response_cache import response_cache
+from ..services.util import field_projection, next_page_cursor, page_after
 
 log = structlog.get_logger()
 settings: Settings = get_settings()
@@ -33,19 +38,49 @@ async def create_category(
     raise HTTPException(status_code=201, detail="New category is created.")
 
 
-@router.get("/categories/{category_id}", response_model=Category)
-async def get_site_by_site_code(category_id: str):
+@router.get(
+    "/categories/{category_id}",
+    response_model=Category,
+    response_model_exclude_unset=True,
+)
+async def get_site_by_site_code(
+    request: Request, category_id: str, fields: Optional[str] = None
+):
     category_dict: Category = await CategoryRepository.find_one(
-        **dict(_id=ObjectId(category_id))
+        projection=field_projection(Category, fields),
+        **dict(_id=ObjectId(category_id)),
     )
     if category_dict:
-        return category_dict
+        updated_at = category_dict.updated_at
+        return conditional_response(
+            request,
+            category_dict,
+            version=(category_dict.id, updated_at) if updated_at else None,
+            last_modified=updated_at,
+        )
     else:
         raise HTTPException(status_code=404, detail="Category not found")
 
 
+@router.get("/categories/{category_id}/stats", response_model=CardStats)
+async def get_category_stats(category_id: str):
+    """Number of cards of a category in total and per status."""
+    if not await CategoryRepository.find_one(**dict(_id=ObjectId(category_id))):
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    return await CardStatsRepository.find_one(ObjectId(category_id))
+
+
 @router.get("/categories")
-async def get_category_list(query_params: CategoryQueryParams = Depends()):
+async def get_category_list(
+    request: Request, query_params: CategoryQueryParams = Depends()
+):
+    # Keyed before the query, so a concurrent write leaves this entry stale.
+    cache_key = response_cache.key(request, CategoryRepository.generation)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached.response(request, hit=True)
+
     query_filter: Dict[str, Any] = {}
 
     if query_params.id:
@@ -54,11 +89,26 @@ async def get_category_list(query_params: CategoryQueryParams = Depends()):
     if query_params.name:
         query_filter["name"] = query_params.name
 
+    if not 0 <= query_params.skip <= settings.max_page_skip:
+        raise HTTPException(
+            status_code=400,
+            detail=f"skip must be between 0 and {settings.max_page_skip}, use cursor to page further.",
+        )
+
+    after = page_after(query_params.cursor)
+
     docs: List[Category] = await CategoryRepository.find(
-        query_filter=query_filter, skip=query_params.skip, limit=query_params.limit
+        query_filter=query_filter,
+        skip=query_params.skip,
+        limit=query_params.limit,
+        projection=field_projection(Category, query_params.fields),
+        after=after,
     )
 
     if not docs:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    return {"category": docs}
+    return response_cache.set(
+        cache_key,
+        {"category": docs, "next_cursor": next_page_cursor(docs, query_params.limit)},
+    ).response(request, hit=False)
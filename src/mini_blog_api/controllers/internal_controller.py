@@ -1,10 +1,18 @@
+import hmac
+
 import structlog
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import PlainTextResponse
 from starlette_context import context
 
 from ..config import Settings, get_settings
+from ..metrics import http_metrics
 from ..models.base_model import AppInfo, default_responses
+from ..repositories.category_repository import CategoryRepository
+from ..repositories.indexes import index_drift
+from ..repositories.stats_repository import CardStatsRepository
+from ..services.response_cache import response_cache
+from ..services.singleflight import render_metrics as render_singleflight_metrics
 
 log = structlog.get_logger()
 
@@ -42,3 +50,46 @@ async def healthcheck(settings: Settings = Depends(get_settings)):
 @router.get("/testing")
 async def testing():
     return PlainTextResponse("Hello World!")
+
+
+@router.get("/indexes")
+async def indexes():
+    """Declared versus actual collection indexes, flagging any drift."""
+    report = await index_drift()
+    return dict(in_sync=all(r["in_sync"] for r in report), collections=report)
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit and miss counters of the in-process caches."""
+    return dict(
+        category=CategoryRepository.cache.stats(), responses=response_cache.stats()
+    )
+
+
+@router.post("/stats/reconcile")
+async def reconcile_stats():
+    """Recount the card statistics now instead of waiting for the periodic job."""
+    return dict(counters=await CardStatsRepository.reconcile())
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    responses={200: {"content": {"text/plain": {}}}},
+)
+async def metrics(request: Request, settings: Settings = Depends(get_settings)):
+    """Request counters, latency histograms and read coalescing in Prometheus format.
+
+    The route skips the JWT middleware so a scraper can reach it; set
+    ``metrics_token`` to require a static bearer token instead.
+    """
+    if settings.metrics_token:
+        expected = f"Bearer {settings.metrics_token}"
+        received = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(received.encode(), expected.encode()):
+            raise HTTPException(status_code=403, detail="Invalid scrape token.")
+    return PlainTextResponse(
+        http_metrics.render() + render_singleflight_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,8 +1,10 @@
-from typing import Any, Dict, List
+import asyncio
+from typing import Any, Dict, List, Optional
 
 import structlog
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from starlette_context.middleware import RawContextMiddleware
 
 from .__init__ import __name__ as app_name
 from .__init__ import __version__ as app_version
@@ -13,16 +15,22 @@ from .controllers import (
     category_controller,
     internal_controller,
 )
+from .metrics import Instrumentation
 from .middleware import Authorization
 from .models.base_model import AppInfo
 from .repositories.auth_repository import AuthRepository
 from .repositories.card_repository import CardRepository
 from .repositories.category_repository import CategoryRepository
-from .repositories.db import get_db
+from .repositories.db import ConnectionManager, get_db
+from .repositories.indexes import ensure_indexes
+from .repositories.stats_repository import CardStatsRepository
+from .services.auth import auth_executor
 
 log: structlog.BoundLogger = structlog.get_logger()
 settings: Settings = get_settings()
 
+stats_task: Optional[asyncio.Task] = None
+
 
 class MiniBlogAPI(FastAPI):
     def __init__(self, *args, **kwargs) -> None:
@@ -30,11 +38,34 @@ class MiniBlogAPI(FastAPI):
 
 
 async def startup() -> None:
+    await ConnectionManager.warmup()
+    await ensure_indexes()
+    if settings.category_cache_preload:
+        await CategoryRepository.preload()
+    if settings.card_stats_reconcile_interval > 0:
+        global stats_task
+        stats_task = asyncio.create_task(
+            reconcile_card_stats(settings.card_stats_reconcile_interval)
+        )
     log.msg("application startup complete")
 
 
 async def shutdown() -> None:
     log.msg("application is shutting down")
+    if stats_task is not None:
+        stats_task.cancel()
+    ConnectionManager.close()
+    auth_executor.shutdown()
+
+
+async def reconcile_card_stats(interval: float) -> None:
+    """Recount the card statistics at startup and then every ``interval`` seconds."""
+    while True:
+        try:
+            await CardStatsRepository.reconcile()
+        except Exception as error:
+            log.error("card stats reconcile failed", error=str(error))
+        await asyncio.sleep(interval)
 
 
 def create_app(app_name: str = app_name, app_version: str = app_version) -> MiniBlogAPI:
@@ -61,7 +92,9 @@ def create_app(app_name: str = app_name, app_version: str = app_version) -> Mini
     # Additional information for openapi docs
     app.openapi_tags = openapi_tags
 
+    app.add_middleware(RawContextMiddleware)  # request context read by the handlers
     app.add_middleware(Authorization)
+    app.add_middleware(Instrumentation)  # outermost, so rejected requests count too
 
     # Register application lifecycle envents
     app.add_event_handler("startup", startup)
@@ -74,3 +107,4 @@ def init_db(db_uri: str = settings.db_uri, db_name: str = settings.db_name):
     AuthRepository.initialize(db=db)
     CategoryRepository.initialize(db=db)
     CardRepository.initialize(db=db)
+    CardStatsRepository.initialize(db=db)
@@ -0,0 +1,156 @@
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds in seconds of the request latency histogram buckets.
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+MetricKey = Tuple[str, str, str]
+
+
+class RouteMetrics:
+    __slots__ = ("buckets", "total", "count")
+
+    def __init__(self, size: int) -> None:
+        self.buckets: List[int] = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class HTTPMetrics:
+    """Request counters and latency histograms per method, route and status.
+
+    Updates are plain attribute increments made from the event loop thread only, so
+    no locking is involved.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.routes: Dict[MetricKey, RouteMetrics] = {}
+
+    def observe(self, method: str, route: str, status: int, duration: float) -> None:
+        key = (method, route, str(status))
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics(len(self.buckets) + 1)
+        metrics.buckets[bisect_left(self.buckets, duration)] += 1
+        metrics.total += duration
+        metrics.count += 1
+
+    def reset(self) -> None:
+        self.routes.clear()
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP http_requests_total Total number of HTTP requests.",
+            "# TYPE http_requests_total counter",
+        ]
+        for key, metrics in sorted(self.routes.items()):
+            lines.append(f"http_requests_total{{{labels(key)}}} {metrics.count}")
+
+        lines.extend(
+            [
+                "# HELP http_request_duration_seconds HTTP request latency.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+        )
+        for key, metrics in sorted(self.routes.items()):
+            key_labels = labels(key)
+            cumulative = 0
+            bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, metrics.buckets):
+                cumulative += count
+                lines.append(
+                    "http_request_duration_seconds_bucket"
+                    f'{{{key_labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f"http_request_duration_seconds_sum{{{key_labels}}} {metrics.total}"
+            )
+            lines.append(
+                f"http_request_duration_seconds_count{{{key_labels}}} {metrics.count}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(key: MetricKey) -> str:
+    method, route, status = key
+    return (
+        f'method="{escape_label(method)}",route="{escape_label(route)}",'
+        f'status="{status}"'
+    )
+
+
+http_metrics = HTTPMetrics()
+
+
+class Instrumentation:
+    """Pure ASGI middleware recording every HTTP request into ``http_metrics``.
+
+    Requests are labelled by route template, e.g. ``/api/v1/cards/{card_id}``, to
+    keep the number of series bounded.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: HTTPMetrics = http_metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.observe(
+                scope["method"],
+                route_template(scope),
+                status,
+                time.perf_counter() - start,
+            )
+
+
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path_format
+
+    # Requests rejected before routing, e.g. by the authorization middleware
+    app = scope.get("app")
+    router: Optional[ASGIApp] = getattr(app, "router", None)
+    for candidate in getattr(router, "routes", []):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return getattr(candidate, "path_format", "unmatched")
+    return "unmatched"
@@ -1,7 +1,6 @@
-import typing
+from typing import Any, Dict, FrozenSet, Optional, Tuple
 
 import jwt
-from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 from jwt.exceptions import (
     ExpiredSignatureError,
@@ -9,67 +8,85 @@ from jwt.exceptions import (
     InvalidSignatureError,
     MissingRequiredClaimError,
 )
-from starlette.middleware.base import (
-    BaseHTTPMiddleware,
-    DispatchFunction,
-    RequestResponseEndpoint,
-)
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from .config import Settings, get_settings
+from .services.cache import LRUCache
 from .services.util import strtolist
 
 settings: Settings = get_settings()
 
-routes_to_protect = strtolist(settings.routes_to_exclude)
+routes_to_protect: FrozenSet[str] = frozenset(strtolist(settings.routes_to_exclude))
+
 
+class Authorization:
+    """Pure ASGI middleware validating the bearer JWT of every protected request.
 
-class Authorization(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
+    Verified claims are kept in a bounded LRU cache until the token's ``exp`` so
+    clients reusing one token skip the signature check on subsequent calls.
+    """
 
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
-        path = request.url.path
+    def __init__(
+        self,
+        app: ASGIApp,
+        token_cache_size: int = settings.token_cache_size,
+    ) -> None:
+        self.app = app
+        self.token_cache = LRUCache(maxsize=token_cache_size)
 
-        if path in routes_to_protect:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in routes_to_protect:
+            await self.app(scope, receive, send)
+            return
 
-        auth_header = request.headers.get("Authorization")
+        auth_header = Headers(scope=scope).get("Authorization")
 
         if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=403, content={"reason": "Authorization token is missing"}
             )
+            await response(scope, receive, send)
+            return
+
+        token = auth_header[len("Bearer ") :].strip()
+        claims = self.token_cache.get(token)
+
+        if claims is None:
+            claims, response = self.verify_token(token)
+            if response is not None:
+                await response(scope, receive, send)
+                return
+            exp = claims.get("exp")
+            if exp is not None:
+                self.token_cache.set(token, claims, expires_at=float(exp))
 
-        scheme, token = auth_header.split()
-        scheme = scheme.lower()
+        scope.setdefault("state", {})["user"] = claims["sub"]
 
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def verify_token(token: str) -> Tuple[Dict[str, Any], Optional[JSONResponse]]:
         try:
             claims = jwt.decode(
                 token, settings.jwt_secret, algorithms=[settings.jwt_alg]
             )
-            user = claims.get("sub")
-            if user is None:
-                return HTTPException(status_code=401, detail="Invalid token.")
-
-            request.state.user = user
-
-            return await call_next(request)
+            if claims.get("sub") is None:
+                return claims, JSONResponse(
+                    status_code=401, content={"reason": "Invalid token."}
+                )
+            return claims, None
         except InvalidAlgorithmError:
-            return JSONResponse(
+            return {}, JSONResponse(
                 status_code=403, content={"reason": "Unsupported algorithm in token"}
             )
         except InvalidSignatureError:
-            return JSONResponse(
+            return {}, JSONResponse(
                 status_code=403, content={"reason": "Invalid signature error"}
             )
         except MissingRequiredClaimError as exc:
-            return JSONResponse(status_code=403, content={"reason": str(exc)})
+            return {}, JSONResponse(status_code=403, content={"reason": str(exc)})
         except ExpiredSignatureError:
-            return JSONResponse(status_code=401, content={"reason": "Expired"})
+            return {}, JSONResponse(status_code=401, content={"reason": "Expired"})
         except jwt.PyJWTError as exc:
-            return JSONResponse(status_code=401, content={"reason": str(exc)})
+            return {}, JSONResponse(status_code=401, content={"reason": str(exc)})
@@ -1,6 +1,9 @@
+from functools import lru_cache
+from typing import Any, Optional, Type
+
 from bson.objectid import ObjectId
 from pydantic import BaseModel as PydanticBaseModel
-from pydantic import Field
+from pydantic import Field, create_model, model_serializer
 
 from ..config import Settings, get_settings
 
@@ -14,6 +17,34 @@ class BaseModel(PydanticBaseModel):
         json_encoders = {ObjectId: str}
 
 
+class PartialModel(BaseModel):
+    """Base of sparse fieldset models, only the loaded fields are serialized."""
+
+    @model_serializer(mode="wrap")
+    def _serialize_loaded_fields(self, handler: Any) -> Any:
+        data = handler(self)
+        loaded = set()
+        for name in self.model_fields_set:
+            loaded.add(name)
+            loaded.add(self.model_fields[name].alias or name)
+        return {key: value for key, value in data.items() if key in loaded}
+
+
+@lru_cache
+def partial_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """Variant of ``model`` where every field is optional, used with projections."""
+    fields = {
+        name: (
+            Optional[field.annotation],
+            Field(default=None, alias=field.alias, title=field.title),
+        )
+        for name, field in model.model_fields.items()
+    }
+    return create_model(
+        f"Partial{model.__name__}", __base__=(PartialModel, model), **fields
+    )
+
+
 class ErrorMessage(BaseModel):
     detail: str = Field(title="Detail", description="Error information")
 
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum, unique
-from typing import Optional
+from typing import Dict, List, Optional
 
 from bson.objectid import ObjectId
 from fastapi import Query
@@ -36,6 +36,7 @@ class CardPayloadCreate(BaseModel):
 
 class Card(BaseModel):
     id: ObjectId = Field(title="Card Object ID", alias="_id")
+    name: str = Field(title="Card Name")
     status: CardStatusLabel = Field(title="Card Status")
     category: ObjectId = Field(title="Card's Category Object ID")
     author: ObjectId = Field(title="UserAuth Object ID")
@@ -47,5 +48,62 @@ class Card(BaseModel):
 class CardQueryParams(BaseModel):
     skip: Optional[int] = Query(default=0)
     limit: Optional[int] = Query(default=100)
+    cursor: Optional[str] = Query(default=None)
     id: Optional[str] = Query(default=None)
     name: Optional[str] = Query(default=None)
+    fields: Optional[str] = Query(default=None)
+
+
+class CardFeedParams(BaseModel):
+    limit: Optional[int] = Query(default=100)
+    cursor: Optional[str] = Query(default=None)
+    fields: Optional[str] = Query(default=None)
+
+
+class CardExportParams(BaseModel):
+    name: Optional[str] = Query(default=None)
+    status: Optional[CardStatusLabel] = Query(default=None)
+    category: Optional[str] = Query(default=None)
+
+
+class CardSearchParams(BaseModel):
+    q: str = Query(min_length=1)
+    status: Optional[CardStatusLabel] = Query(default=None)
+    category: Optional[str] = Query(default=None)
+    limit: Optional[int] = Query(default=20)
+    cursor: Optional[str] = Query(default=None)
+
+
+class CardStats(BaseModel):
+    total: int = Field(title="Number of Cards")
+    statuses: Dict[str, int] = Field(title="Number of Cards per Status")
+
+
+class CardBulkCreatePayload(BaseModel):
+    cards: List[CardPayload] = Field(title="Cards to create")
+
+
+class CardStatusChange(BaseModel):
+    id: str = Field(title="Card Object ID")
+    status: CardStatusLabel = Field(title="New Card Status")
+
+
+class CardBulkStatusPayload(BaseModel):
+    cards: List[CardStatusChange] = Field(title="Card status changes")
+
+
+class CardBulkDeletePayload(BaseModel):
+    ids: List[str] = Field(title="Card Object IDs to delete")
+
+
+class BulkItemResult(BaseModel):
+    index: int = Field(title="Position of the item in the request")
+    card_id: Optional[str] = Field(default=None, title="Card Object ID")
+    status_code: int = Field(title="HTTP status of the item")
+    detail: Optional[str] = Field(default=None, title="Error information")
+
+
+class BulkResult(BaseModel):
+    succeeded: int = Field(title="Number of successful items")
+    failed: int = Field(title="Number of failed items")
+    results: List[BulkItemResult] = Field(title="Per item results in request order")
@@ -11,8 +11,10 @@ from .base_model import BaseModel
 class CategoryQueryParams(BaseModel):
     skip: Optional[int] = Query(default=0)
     limit: Optional[int] = Query(default=100)
+    cursor: Optional[str] = Query(default=None)
     id: Optional[str] = Query(default=None)
     name: Optional[str] = Query(default=None)
+    fields: Optional[str] = Query(default=None)
 
 
 class CategoryPayload(BaseModel):
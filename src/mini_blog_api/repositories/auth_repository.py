@@ -6,24 +6,37 @@ import structlog
 from bson.objectid import ObjectId
 from fastapi import HTTPException
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
 
 from ..models.auth_model import UserAuth, UserAuthPayload
-from ..services.auth import generate_pwd, verify_password
+from ..services.auth import generate_pwd, hash_password, verify_password
 from ..services.util import sanitize
+from .db import find_one_doc, id_loader
 
 log = structlog.get_logger()
 
 
 class AuthRepository:
+    indexes = [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True)
+    ]
+
+    # Stored as password_version. Older accounts were handed their stored hash as
+    # password, scripts/db/migrate-passwords.py re-hashes that hash for them.
+    password_version = 2
+
     @classmethod
     def initialize(cls, db: AsyncIOMotorClient) -> None:
         cls.collection = db["user_auth"]
+        cls.loader = id_loader(cls.collection)
 
     @classmethod
     async def find_one(cls, **kwargs) -> Optional[UserAuth]:
         try:
-            user_auth_dict: Dict[str, Any] = await cls.collection.find_one(kwargs)
+            user_auth_dict: Dict[str, Any] = await find_one_doc(
+                cls.collection, cls.loader, kwargs
+            )
             if user_auth_dict:
                 return UserAuth.model_validate(user_auth_dict)
 
@@ -36,16 +49,21 @@ class AuthRepository:
         try:
             payload = doc.model_dump_json()
             author_data = json.loads(payload)
-            author_data["password"] = generate_pwd()
+            password = generate_pwd()
+            author_data["password"] = await hash_password(password)
+            author_data["password_version"] = cls.password_version
             author_data["created_at"] = datetime.utcnow()
             author_data["updated_at"] = datetime.utcnow()
             sanitize(author_data)
             await cls.collection.insert_one(author_data)
             return {
                 "username": author_data.get("username"),
-                "password": author_data.get("password"),
+                "password": password,
             }
 
+        except DuplicateKeyError:
+            raise HTTPException(status_code=403, detail="Username already exists.")
+
         except ServerSelectionTimeoutError as error:
             log.msg(error)
             raise HTTPException(500, "Failed to connect to MongoDB.")
@@ -57,7 +75,7 @@ class AuthRepository:
         if not user:
             return None
 
-        if verify_password(password, user.password):
+        if await verify_password(password, user.password):
             return user
 
         return None
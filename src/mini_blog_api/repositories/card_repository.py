@@ -1,29 +1,79 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
 
 import structlog
 from bson.objectid import ObjectId
 from fastapi import HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCursor
-from pymongo.errors import ServerSelectionTimeoutError
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorCursor,
+)
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, UpdateOne
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+    OperationFailure,
+    ServerSelectionTimeoutError,
+)
 
+from ..config import Settings, get_settings
+from ..models.base_model import partial_model
 from ..models.card_model import Card, CardPayloadCreate
-from .auth_repository import AuthRepository
+from ..services.search import InvertedIndex
+from ..services.singleflight import SingleFlight
+from .db import find_one_doc, id_loader
+from .stats_repository import CardStatsRepository
 
 log = structlog.get_logger()
+settings: Settings = get_settings()
+
+# OperationFailure code of a $text query on a collection without text index.
+TEXT_INDEX_REQUIRED = 27
 
 
 class CardRepository:
+    indexes = [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+        IndexModel([("name", TEXT), ("content", TEXT)], name="name_content_text"),
+        IndexModel(
+            [("author", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="author_created_at",
+        ),
+    ]
+
+    # Fields a card update may never overwrite.
+    immutable_fields = frozenset(["_id", "author", "created_at"])
+
+    # Fields the card statistics are counted by.
+    stats_projection = {"category": 1, "status": 1}
+
+    # Bumped by every write, responses cached from older generations are stale.
+    generation = 0
+
+    # Identical concurrent reads share one query.
+    flight = SingleFlight("cards")
+
     @classmethod
     def initialize(cls, db: AsyncIOMotorClient) -> None:
         cls.collection = db["cards"]
+        cls.loader = id_loader(cls.collection)
+        cls.invalidate()
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Mark cached card responses stale, called by every write to the collection."""
+        cls.generation += 1
 
     @classmethod
-    async def find_one(cls, **kwargs) -> Optional[Card]:
+    async def find_one(
+        cls, projection: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> Optional[Card]:
         try:
-            card_dict: Dict[str, Any] = await cls.collection.find_one(kwargs)
+            card_dict = await cls.find_one_raw(projection, **kwargs)
             if card_dict:
-                return Card.model_validate(card_dict)
+                model = partial_model(Card) if projection else Card
+                return model.model_validate(card_dict)
 
         except ServerSelectionTimeoutError as error:
             log.error(error)
@@ -49,35 +99,239 @@ class CardRepository:
         skip: int,
         limit: int,
         projection: Optional[Dict[str, Any]] = None,
+        after: Optional[ObjectId] = None,
     ):
+        """Find documents in ``_id`` order, starting after the ``after`` keyset cursor."""
+        try:
+            model = partial_model(Card) if projection else Card
+            return [
+                model.model_validate(doc)
+                for doc in await cls.find_raw(
+                    query_filter, skip, limit, projection, after
+                )
+            ]
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
+
+    @classmethod
+    async def find_one_raw(
+        cls, projection: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """Like :meth:`find_one` but returns the stored document unvalidated."""
+        try:
+            return await cls.flight.do(
+                ("find_one", repr(sorted(kwargs.items())), repr(projection)),
+                lambda: find_one_doc(cls.collection, cls.loader, kwargs, projection),
+            )
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
+
+    @classmethod
+    async def find_raw(
+        cls,
+        query_filter: Dict[str, Any],
+        skip: int,
+        limit: int,
+        projection: Optional[Dict[str, Any]] = None,
+        after: Optional[ObjectId] = None,
+    ) -> List[Dict[str, Any]]:
+        """Like :meth:`find` but returns the stored documents unvalidated.
+
+        Reads go through single-flight, concurrent callers share the list.
+        """
+
+        async def fetch() -> List[Dict[str, Any]]:
+            db_cursor = cls._page(
+                cls.collection, query_filter, skip, limit, projection, after
+            )
+            return [doc async for doc in db_cursor]
+
+        try:
+            key = (
+                "find",
+                repr(query_filter),
+                skip,
+                limit,
+                repr(projection),
+                after,
+            )
+            return await cls.flight.do(key, fetch)
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
+
+    @classmethod
+    async def find_by_author(
+        cls,
+        author: ObjectId,
+        limit: int,
+        projection: Optional[Dict[str, Any]] = None,
+        after: Optional[Tuple[datetime, ObjectId]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Cards of ``author``, newest first, as unvalidated documents.
+
+        Pages by the ``(created_at, _id)`` keyset of the last card so every page is
+        a bounded range scan of the ``author_created_at`` index.
+        """
+        query_filter: Dict[str, Any] = {"author": author}
+        if after is not None:
+            created_at, last_id = after
+            query_filter["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": last_id}},
+            ]
+
         try:
-            docs: List[Card] = []
             db_cursor: AsyncIOMotorCursor = cls.collection.find(
-                query_filter, projection, skip, limit
+                query_filter,
+                projection,
+                limit=limit,
+                sort=[("created_at", DESCENDING), ("_id", DESCENDING)],
             )
-            async for doc in db_cursor:
-                docs.append(Card.model_validate(doc))
-            return docs
+            return [doc async for doc in db_cursor]
 
         except ServerSelectionTimeoutError as error:
             log.error(error)
             raise HTTPException(500, "Failed to connect to MongoDB.")
 
     @classmethod
-    async def insert_one(cls, doc: CardPayloadCreate, current_user: str):
+    async def search(
+        cls,
+        text: str,
+        query_filter: Dict[str, Any],
+        limit: int,
+        after: Optional[Tuple[float, ObjectId]] = None,
+    ) -> List[Mapping[str, Any]]:
+        """Cards matching ``text`` with their relevance ``score``, best match first.
+
+        Pages by the ``(score, _id)`` keyset of the last result. Uses the text index
+        and falls back to an in-memory inverted index over at most
+        ``search_fallback_max_docs`` cards when there is none.
+        """
         try:
-            card_data = dict(
-                name=doc.name,
-                status=doc.status,
-                category=ObjectId(doc.category),
-                author=ObjectId(current_user),
-                content=doc.content,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
+            pipeline: List[Dict[str, Any]] = [
+                {"$match": dict(query_filter, **{"$text": {"$search": text}})},
+                {"$addFields": {"score": {"$meta": "textScore"}}},
+            ]
+            if after is not None:
+                score, last_id = after
+                pipeline.append(
+                    {
+                        "$match": {
+                            "$or": [
+                                {"score": {"$lt": score}},
+                                {"score": score, "_id": {"$gt": last_id}},
+                            ]
+                        }
+                    }
+                )
+            pipeline.extend([{"$sort": {"score": -1, "_id": 1}}, {"$limit": limit}])
+
+            return await cls.collection.aggregate(pipeline).to_list(length=None)
+
+        except OperationFailure as error:
+            if error.code != TEXT_INDEX_REQUIRED:
+                log.error(error)
+                raise HTTPException(500, "Failed to search cards.")
+            log.msg("text search falling back to inverted index", error=str(error))
+            return await cls._search_fallback(text, query_filter, limit, after)
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
+
+    @classmethod
+    async def _search_fallback(
+        cls,
+        text: str,
+        query_filter: Dict[str, Any],
+        limit: int,
+        after: Optional[Tuple[float, ObjectId]],
+    ) -> List[Mapping[str, Any]]:
+        index = InvertedIndex()
+        docs: Dict[ObjectId, Dict[str, Any]] = {}
+        db_cursor: AsyncIOMotorCursor = cls.collection.find(
+            query_filter, limit=settings.search_fallback_max_docs
+        )
+        async for doc in db_cursor:
+            docs[doc["_id"]] = doc
+            index.add(doc["_id"], doc.get("name"), doc.get("content"))
+        if len(docs) >= settings.search_fallback_max_docs:
+            log.msg("text search fallback scan truncated", scanned=len(docs))
+
+        results: List[Mapping[str, Any]] = []
+        for score, doc_id in index.search(text):
+            if after is not None and (-score, doc_id) <= (-after[0], after[1]):
+                continue
+            results.append(dict(docs[doc_id], score=score))
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def _page(
+        collection: AsyncIOMotorCollection,
+        query_filter: Dict[str, Any],
+        skip: int,
+        limit: int,
+        projection: Optional[Dict[str, Any]],
+        after: Optional[ObjectId],
+    ) -> AsyncIOMotorCursor:
+        if after is not None:
+            page_filter = {"_id": {"$gt": after}}
+            query_filter = (
+                {"$and": [query_filter, page_filter]} if query_filter else page_filter
             )
+
+        return collection.find(
+            query_filter, projection, skip, limit, sort=[("_id", ASCENDING)]
+        )
+
+    @classmethod
+    async def stream(
+        cls, query_filter: Dict[str, Any], batch_size: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield raw card documents in ``_id`` order without buffering the result set."""
+        try:
+            db_cursor: AsyncIOMotorCursor = cls.collection.find(
+                query_filter, sort=[("_id", ASCENDING)]
+            ).batch_size(batch_size)
+            async for doc in db_cursor:
+                yield doc
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise
+
+    @staticmethod
+    def _card_document(doc: CardPayloadCreate, current_user: str) -> Dict[str, Any]:
+        return dict(
+            name=doc.name,
+            status=doc.status,
+            category=ObjectId(doc.category),
+            author=ObjectId(current_user),
+            content=doc.content,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+
+    @classmethod
+    async def insert_one(cls, doc: CardPayloadCreate, current_user: str):
+        try:
+            card_data = cls._card_document(doc, current_user)
             inserted_data = await cls.collection.insert_one(card_data)
+            cls.invalidate()
+            await CardStatsRepository.record(added=[card_data])
             return inserted_data.inserted_id
 
+        except DuplicateKeyError:
+            raise HTTPException(status_code=403, detail="card already exists.")
+
         except ServerSelectionTimeoutError as error:
             log.msg(error)
             raise HTTPException(500, "Failed to connect to MongoDB.")
@@ -85,56 +339,210 @@ class CardRepository:
     @classmethod
     async def update_one(
         cls, card_id: str, card_data: Dict[str, Any], current_user: str
-    ) -> Optional[Dict]:
-        try:
-            card = await CardRepository.find_one(**dict(_id=ObjectId(card_id)))
+    ) -> Optional[Dict[str, Any]]:
+        """Update a card owned by ``current_user`` with a single conditional write.
 
-            if not card:
-                return None
+        Returns the updated card's category and status, None when the card does not
+        exist and raises 403 when it belongs to another author.
+        """
+        try:
+            query = {"_id": ObjectId(card_id), "author": ObjectId(current_user)}
+            set_data = {
+                key: value
+                for key, value in card_data.items()
+                if key not in cls.immutable_fields
+            }
+            if ObjectId.is_valid(set_data.get("category")):
+                set_data["category"] = ObjectId(set_data["category"])
+            set_data["updated_at"] = datetime.utcnow()
 
-            card_author = await AuthRepository.find_one(
-                **dict(_id=ObjectId(card.author))
+            before: Optional[Dict[str, Any]] = await cls.collection.find_one_and_update(
+                query, {"$set": set_data}, projection=cls.stats_projection
             )
 
-            if not card_author:
-                return None
+            if before:
+                cls.invalidate()
+                after = {key: set_data.get(key, before.get(key)) for key in before}
+                if after != before:
+                    await CardStatsRepository.record(removed=[before], added=[after])
+                return after
 
-            if ObjectId(card_author.id) != ObjectId(current_user):
-                raise HTTPException(
-                    status_code=403, detail="You are unauthorized to edit this card"
-                )
+            return await cls._not_found_or_forbidden(card_id)
 
-            query = {"_id": ObjectId(card_id)}
-            set_data = {"$set": card_data}
+        except ServerSelectionTimeoutError as error:
+            log.msg(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
 
-            return await cls.collection.update_one(query, set_data)
+    @classmethod
+    async def delete_one(
+        cls, card_id: str, current_user: str
+    ) -> Optional[Dict[str, Any]]:
+        """Delete a card owned by ``current_user`` with a single conditional write.
+
+        Returns the deleted card's category and status, None when the card does not
+        exist and raises 403 when it belongs to another author.
+        """
+        try:
+            query = {"_id": ObjectId(card_id), "author": ObjectId(current_user)}
+            deleted: Optional[
+                Dict[str, Any]
+            ] = await cls.collection.find_one_and_delete(
+                query, projection=cls.stats_projection
+            )
+
+            if deleted:
+                cls.invalidate()
+                await CardStatsRepository.record(removed=[deleted])
+                return deleted
+
+            return await cls._not_found_or_forbidden(card_id)
 
         except ServerSelectionTimeoutError as error:
             log.msg(error)
             raise HTTPException(500, "Failed to connect to MongoDB.")
 
     @classmethod
-    async def delete_one(cls, card_id: str, current_user: str):
+    async def _not_found_or_forbidden(cls, card_id: str) -> None:
+        """Tell apart a missing card from one owned by somebody else.
+
+        Only runs after an owner filtered write matched nothing.
+        """
+        if await cls.collection.count_documents({"_id": ObjectId(card_id)}, limit=1):
+            raise HTTPException(
+                status_code=403, detail="You are unauthorized to edit this card"
+            )
+        return None
+
+    @classmethod
+    async def insert_many(
+        cls, docs: List[CardPayloadCreate], current_user: str
+    ) -> Tuple[List[ObjectId], Dict[int, Tuple[int, str]]]:
+        """Insert cards unordered in one request.
+
+        Returns the ids assigned to ``docs`` and the status code and reason of every
+        position that failed to insert.
+        """
+        card_data = [
+            dict(cls._card_document(doc, current_user), _id=ObjectId()) for doc in docs
+        ]
+        errors: Dict[int, Tuple[int, str]] = {}
+
         try:
-            card = await CardRepository.find_one(**dict(_id=ObjectId(card_id)))
+            await cls.collection.insert_many(card_data, ordered=False)
+
+        except BulkWriteError as error:
+            for write_error in error.details.get("writeErrors", []):
+                if write_error.get("code") == 11000:
+                    errors[write_error["index"]] = (403, "card already exists.")
+                else:
+                    errors[write_error["index"]] = (500, write_error.get("errmsg"))
+
+        except ServerSelectionTimeoutError as error:
+            log.msg(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
 
-            if not card:
-                return None
+        cls.invalidate()
+        await CardStatsRepository.record(
+            added=[card for index, card in enumerate(card_data) if index not in errors]
+        )
+        return [card["_id"] for card in card_data], errors
 
-            card_author = await AuthRepository.find_one(
-                **dict(_id=ObjectId(card.author))
+    @classmethod
+    async def update_status_many(
+        cls, changes: List[Tuple[ObjectId, str]], current_user: str
+    ) -> Tuple[Dict[ObjectId, int], Dict[int, Tuple[int, str]]]:
+        """Apply status changes to the cards of ``current_user`` with one bulk write.
+
+        Returns the status code of every card id, see :meth:`_ownership`, and the
+        status code and reason of every position in ``changes`` that failed to write.
+        """
+        errors: Dict[int, Tuple[int, str]] = {}
+
+        try:
+            ownership, owned = await cls._ownership(
+                [_id for _id, _ in changes], current_user
             )
+            now = datetime.utcnow()
+            positions = [
+                position for position, (_id, _) in enumerate(changes) if _id in owned
+            ]
+            requests = [
+                UpdateOne(
+                    {"_id": changes[position][0], "author": ObjectId(current_user)},
+                    {"$set": {"status": changes[position][1], "updated_at": now}},
+                )
+                for position in positions
+            ]
+            if requests:
+                try:
+                    await cls.collection.bulk_write(requests, ordered=False)
 
-            if not card_author:
-                return None
+                except BulkWriteError as error:
+                    for write_error in error.details.get("writeErrors", []):
+                        errors[positions[write_error["index"]]] = (
+                            500,
+                            write_error.get("errmsg"),
+                        )
 
-            if ObjectId(card_author.id) != ObjectId(current_user):
-                raise HTTPException(
-                    status_code=403, detail="You are unauthorized to edit this card"
+                cls.invalidate()
+                # count a card changed more than once by its last applied status
+                statuses = {
+                    changes[position][0]: changes[position][1]
+                    for position in positions
+                    if position not in errors
+                }
+                await CardStatsRepository.record(
+                    removed=[owned[_id] for _id in statuses],
+                    added=[
+                        dict(owned[_id], status=status)
+                        for _id, status in statuses.items()
+                    ],
                 )
+            return ownership, errors
 
-            return await cls.collection.delete_one(dict(_id=card_id))
+        except ServerSelectionTimeoutError as error:
+            log.msg(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
+
+    @classmethod
+    async def delete_many(
+        cls, card_ids: List[ObjectId], current_user: str
+    ) -> Dict[ObjectId, int]:
+        """Delete the cards of ``current_user`` among ``card_ids`` with one write.
+
+        Returns the status code of every card id, see :meth:`_ownership`.
+        """
+        try:
+            ownership, owned = await cls._ownership(card_ids, current_user)
+            if owned:
+                await cls.collection.delete_many(
+                    {"_id": {"$in": list(owned)}, "author": ObjectId(current_user)}
+                )
+                cls.invalidate()
+                await CardStatsRepository.record(removed=owned.values())
+            return ownership
 
         except ServerSelectionTimeoutError as error:
             log.msg(error)
             raise HTTPException(500, "Failed to connect to MongoDB.")
+
+    @classmethod
+    async def _ownership(
+        cls, card_ids: List[ObjectId], current_user: str
+    ) -> Tuple[Dict[ObjectId, int], Dict[ObjectId, Dict[str, Any]]]:
+        """Map card ids to 200 (owned), 403 (other author) or 404 (missing).
+
+        Also returns the category and status of the owned cards by id.
+        """
+        ownership = {_id: 404 for _id in card_ids}
+        owned: Dict[ObjectId, Dict[str, Any]] = {}
+        db_cursor: AsyncIOMotorCursor = cls.collection.find(
+            {"_id": {"$in": list(ownership)}}, dict(cls.stats_projection, author=1)
+        )
+        async for doc in db_cursor:
+            if doc.get("author") == ObjectId(current_user):
+                ownership[doc["_id"]] = 200
+                owned[doc["_id"]] = doc
+            else:
+                ownership[doc["_id"]] = 403
+        return ownership, owned
@@ -1,29 +1,97 @@
 import json
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import structlog
+from bson.objectid import ObjectId
 from fastapi import HTTPException
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCursor
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
 
+from ..config import Settings, get_settings
+from ..models.base_model import partial_model
 from ..models.category_model import Category, CategoryPayload
+from ..services.cache import LRUCache
+from ..services.singleflight import SingleFlight
 from ..services.util import sanitize
+from .db import find_one_doc, id_loader
 
 log = structlog.get_logger()
+settings: Settings = get_settings()
+
+_MISSING = object()
 
 
 class CategoryRepository:
+    indexes = [IndexModel([("name", ASCENDING)], name="name_unique", unique=True)]
+
+    # Bumped by every write, responses cached from older generations are stale.
+    generation = 0
+
+    # Identical concurrent cache misses share one query.
+    flight = SingleFlight("category")
+
     @classmethod
     def initialize(cls, db: AsyncIOMotorClient) -> None:
         cls.collection = db["category"]
+        cls.loader = id_loader(cls.collection)
+        cls.cache = LRUCache(
+            maxsize=settings.category_cache_size, ttl=settings.category_cache_ttl
+        )
+        cls.invalidate()
 
     @classmethod
-    async def find_one(cls, **kwargs) -> Optional[Category]:
+    def invalidate(cls) -> None:
+        """Drop cached reads, called by every write to the collection.
+
+        Only found categories are cached. Writes made by other processes become
+        visible once the cached entries reach the TTL.
+        """
+        cls.cache.clear()
+        cls.generation += 1
+
+    @classmethod
+    async def preload(cls) -> None:
+        """Warm the cache with id and name lookups of the first categories."""
         try:
-            category_dict: Dict[str, Any] = await cls.collection.find_one(kwargs)
+            db_cursor: AsyncIOMotorCursor = cls.collection.find(
+                {}, limit=cls.cache.maxsize // 2, sort=[("_id", ASCENDING)]
+            )
+            async for doc in db_cursor:
+                category = Category.model_validate(doc)
+                cls.cache.set(cls._find_one_key(_id=category.id), category)
+                cls.cache.set(cls._find_one_key(name=category.name), category)
+            log.msg("category cache preloaded", size=len(cls.cache))
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+
+    @staticmethod
+    def _find_one_key(
+        projection: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> Tuple[str, str, str]:
+        return ("find_one", repr(sorted(kwargs.items())), repr(projection))
+
+    @classmethod
+    async def find_one(
+        cls, projection: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> Optional[Category]:
+        key = cls._find_one_key(projection, **kwargs)
+        cached = cls.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        try:
+            category_dict: Dict[str, Any] = await cls.flight.do(
+                key,
+                lambda: find_one_doc(cls.collection, cls.loader, kwargs, projection),
+            )
             if category_dict:
-                return Category.model_validate(category_dict)
+                model = partial_model(Category) if projection else Category
+                category = model.model_validate(category_dict)
+                cls.cache.set(key, category)
+                return category
 
         except ServerSelectionTimeoutError as error:
             log.error(error)
@@ -36,15 +104,49 @@ class CategoryRepository:
         skip: int,
         limit: int,
         projection: Optional[Dict[str, Any]] = None,
+        after: Optional[ObjectId] = None,
     ):
+        """Find documents in ``_id`` order, starting after the ``after`` keyset cursor."""
+        key = ("find", repr(query_filter), skip, limit, repr(projection), after)
+        cached = cls.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        try:
+            if after is not None:
+                page_filter = {"_id": {"$gt": after}}
+                query_filter = (
+                    {"$and": [query_filter, page_filter]}
+                    if query_filter
+                    else page_filter
+                )
+
+            async def fetch() -> List[Dict[str, Any]]:
+                db_cursor: AsyncIOMotorCursor = cls.collection.find(
+                    query_filter, projection, skip, limit, sort=[("_id", ASCENDING)]
+                )
+                return [doc async for doc in db_cursor]
+
+            model = partial_model(Category) if projection else Category
+            docs: List[Category] = [
+                model.model_validate(doc) for doc in await cls.flight.do(key, fetch)
+            ]
+            if docs:
+                cls.cache.set(key, docs)
+            return docs
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
+
+    @classmethod
+    async def existing_ids(cls, ids: List[ObjectId]) -> Set[ObjectId]:
+        """Subset of ``ids`` that exist, resolved with a single ``$in`` query."""
         try:
-            docs: List[Category] = []
             db_cursor: AsyncIOMotorCursor = cls.collection.find(
-                query_filter, projection, skip, limit
+                {"_id": {"$in": ids}}, {"_id": 1}
             )
-            async for doc in db_cursor:
-                docs.append(Category.model_validate(doc))
-            return docs
+            return {doc["_id"] async for doc in db_cursor}
 
         except ServerSelectionTimeoutError as error:
             log.error(error)
@@ -59,6 +161,10 @@ class CategoryRepository:
             category_data["updated_at"] = datetime.utcnow()
             sanitize(category_data)
             await cls.collection.insert_one(category_data)
+            cls.invalidate()
+
+        except DuplicateKeyError:
+            raise HTTPException(status_code=403, detail="Category already exists.")
 
         except ServerSelectionTimeoutError as error:
             log.error(error)
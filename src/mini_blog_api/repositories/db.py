@@ -1,20 +1,119 @@
+import asyncio
 from abc import ABC, abstractclassmethod
 from typing import Any, Dict, List, Optional
 
 import structlog
+from bson.objectid import ObjectId
 from fastapi import HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo.errors import ServerSelectionTimeoutError
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorDatabase,
+)
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
+
+from ..config import Settings, get_settings
+from ..services.batch_loader import BatchLoader
+from .memory_engine import MemoryEngine
 
 log = structlog.get_logger()
+settings: Settings = get_settings()
+
+
+def client_options(settings: Settings) -> Dict[str, Any]:
+    """Motor client pool and timeout options from the runtime settings."""
+    options = dict(
+        maxPoolSize=settings.db_max_pool_size,
+        minPoolSize=settings.db_min_pool_size,
+        maxIdleTimeMS=settings.db_max_idle_time_ms,
+        waitQueueTimeoutMS=settings.db_wait_queue_timeout_ms,
+        serverSelectionTimeoutMS=settings.db_server_selection_timeout_ms,
+        connectTimeoutMS=settings.db_connect_timeout_ms,
+        socketTimeoutMS=settings.db_socket_timeout_ms,
+    )
+    if settings.db_compressors:
+        options["compressors"] = settings.db_compressors
+    return options
+
+
+class ConnectionManager:
+    """Owns the motor clients of the process, one per database URI."""
+
+    clients: Dict[str, AsyncIOMotorClient] = {}
+
+    @classmethod
+    def client(cls, db_uri: str) -> AsyncIOMotorClient:
+        client = cls.clients.get(db_uri)
+        if client is None:
+            client = AsyncIOMotorClient(db_uri, **client_options(settings))
+            cls.clients[db_uri] = client
+        return client
+
+    @classmethod
+    async def warmup(cls) -> None:
+        """Ping every client and open ``db_min_pool_size`` connections up front."""
+        for client in cls.clients.values():
+            try:
+                await client.admin.command("ping")
+                await asyncio.gather(
+                    *(
+                        client.admin.command("ping")
+                        for _ in range(settings.db_min_pool_size)
+                    )
+                )
+                log.msg(
+                    "db connection pool warmed up",
+                    connections=settings.db_min_pool_size,
+                )
+            except PyMongoError as error:
+                log.error("db connection pool warmup failed", error=str(error))
+
+    @classmethod
+    def close(cls) -> None:
+        """Close every client, returning their pooled connections."""
+        for client in cls.clients.values():
+            client.close()
+        cls.clients.clear()
+        log.msg("db connections closed")
+
+
+def id_loader(collection: AsyncIOMotorCollection) -> BatchLoader[Any, Any]:
+    """Batch loader resolving concurrent by-id lookups with one ``$in`` query."""
+
+    async def find_by_ids(ids: List[Any]) -> Dict[Any, Any]:
+        db_cursor = collection.find({"_id": {"$in": ids}})
+        return {doc["_id"]: doc async for doc in db_cursor}
+
+    return BatchLoader(
+        find_by_ids,
+        window=settings.batch_loader_window,
+        max_batch_size=settings.batch_loader_max_size,
+    )
+
+
+async def find_one_doc(
+    collection: AsyncIOMotorCollection,
+    loader: BatchLoader[Any, Any],
+    query: Dict[str, Any],
+    projection: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """Batch a plain by-id lookup with concurrent ones, query anything else."""
+    if (
+        projection is None
+        and list(query) == ["_id"]
+        and isinstance(query["_id"], ObjectId)
+    ):
+        return await loader.load(query["_id"])
+    return await collection.find_one(query, projection)
 
 
 def get_db(db_uri: str, db_name: str) -> AsyncIOMotorDatabase:
     """Get asyncio database connection."""
+    if settings.db_engine == "memory":
+        return MemoryEngine.database(db_name)
+
     try:
-        dbc: AsyncIOMotorClient = AsyncIOMotorClient(
-            db_uri, serverSelectionTimeoutMS=10
-        )
+        dbc: AsyncIOMotorClient = ConnectionManager.client(db_uri)
         return dbc.get_database(db_name)
 
     except ServerSelectionTimeoutError as error:
@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Sequence
+
+import structlog
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+
+from .auth_repository import AuthRepository
+from .card_repository import CardRepository
+from .category_repository import CategoryRepository
+
+log = structlog.get_logger()
+
+# Repositories whose ``indexes`` declarations are ensured at application startup.
+REPOSITORIES: Sequence[Any] = (AuthRepository, CategoryRepository, CardRepository)
+
+
+def index_spec(index: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a declared or reported index into comparable key and options."""
+    key = index["key"]
+    fields = list(key.items() if hasattr(key, "items") else key)
+    if ("_fts", "text") in fields:
+        # text indexes are reported with their indexed fields in the weights
+        fields = [(field, "text") for field in sorted(index.get("weights", {}))]
+    elif any(direction == "text" for _, direction in fields):
+        fields = sorted(fields)
+    return dict(
+        key=[[field, direction] for field, direction in fields],
+        unique=bool(index.get("unique", False)),
+    )
+
+
+async def ensure_indexes(repositories: Sequence[Any] = REPOSITORIES) -> None:
+    """Create the declared indexes of every repository, existing ones are left as is."""
+    for repository in repositories:
+        indexes: List[IndexModel] = getattr(repository, "indexes", [])
+        if not indexes:
+            continue
+
+        try:
+            names = await repository.collection.create_indexes(indexes)
+            log.msg(
+                "collection indexes ensured",
+                collection=repository.collection.name,
+                indexes=",".join(names),
+            )
+        except (OperationFailure, ServerSelectionTimeoutError) as error:
+            log.error(
+                "failed to ensure collection indexes",
+                collection=repository.collection.name,
+                error=str(error),
+            )
+
+
+async def index_drift(repositories: Sequence[Any] = REPOSITORIES) -> List[Dict]:
+    """Compare declared indexes with the ones present in the database."""
+    report: List[Dict] = []
+
+    for repository in repositories:
+        declared = {
+            index.document["name"]: index_spec(index.document)
+            for index in getattr(repository, "indexes", [])
+        }
+        information = await repository.collection.index_information()
+        actual = {
+            name: index_spec(index)
+            for name, index in information.items()
+            if name != "_id_"
+        }
+
+        missing = sorted(name for name in declared if name not in actual)
+        unexpected = sorted(name for name in actual if name not in declared)
+        mismatched = sorted(
+            name
+            for name, spec in declared.items()
+            if name in actual and actual[name] != spec
+        )
+
+        report.append(
+            dict(
+                collection=repository.collection.name,
+                declared=declared,
+                actual=actual,
+                missing=missing,
+                unexpected=unexpected,
+                mismatched=mismatched,
+                in_sync=not (missing or unexpected or mismatched),
+            )
+        )
+
+    return report
@@ -0,0 +1,947 @@
+"""In-memory storage engine with the motor API surface the repositories use.
+
+Selected with ``DB_ENGINE=memory``, :func:`~.db.get_db` then hands the repositories
+a :class:`MemoryDatabase` instead of a motor database, so load tests and CI run
+without a mongod and at memory speed. The test suite runs on it as well.
+
+Documents are kept BSON encoded next to their decoded form, reads return fresh
+copies which round trip like they would through MongoDB (naive UTC datetimes with
+millisecond precision). ``_id`` and unique indexes are hash indexes, the other
+declared indexes are kept sorted and serve equality prefix plus range scans in
+index order. ``_id`` is kept sorted as well, so ``_id`` ranges and sorts, and with
+them keyset pagination, stop after ``limit`` documents. Every operation runs
+without yielding to the event loop and is atomic for the process.
+
+Only what the repositories call is implemented: equality, comparison, ``$in``,
+``$nin``, ``$and``, ``$or`` and ``$text`` queries, inclusion projections, the
+``$set`` and ``$inc`` update operators, and the ``$match``, ``$addFields``,
+``$group`` (``$sum``), ``$sort`` and ``$limit`` aggregation stages. ``$text``
+needs a text index and scores by term frequency, not with MongoDB's stemming.
+Anything else raises ``OperationFailure``.
+"""
+
+import math
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import total_ordering
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import bson
+from bson.objectid import ObjectId
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+    OperationFailure,
+    WriteError,
+)
+from pymongo.operations import IndexModel, InsertOne, ReplaceOne, UpdateOne
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+from ..services.search import tokenize
+
+Document = Dict[str, Any]
+SortKey = Tuple[Any, ...]
+
+ID_INDEX = "_id_"
+
+COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def sort_key(value: Any) -> SortKey:
+    """Order and equality of BSON values, types ranked like MongoDB does."""
+    if value is None:
+        return (1,)
+    if isinstance(value, bool):
+        return (8, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, dict):
+        return (4, tuple((key, sort_key(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (5, tuple(sort_key(item) for item in value))
+    if isinstance(value, ObjectId):
+        return (7, value.binary)
+    if isinstance(value, datetime):
+        return (9, value)
+    return (10, repr(value))
+
+
+@total_ordering
+class Desc:
+    """Sort key component of a descending index field."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: SortKey) -> None:
+        self.key = key
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Desc):
+            return NotImplemented
+        return self.key == other.key
+
+    def __lt__(self, other: Any) -> bool:
+        if not isinstance(other, Desc):
+            return NotImplemented
+        return other.key < self.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+
+class High:
+    """Sorts after every index key component, bounds scans past equal keys."""
+
+    def __eq__(self, other: Any) -> bool:
+        return self is other
+
+    def __lt__(self, other: Any) -> bool:
+        return False
+
+    def __gt__(self, other: Any) -> bool:
+        return self is not other
+
+    __hash__ = object.__hash__
+
+
+HIGH = High()
+
+
+def normalize(value: Any) -> Any:
+    """Round trip through BSON, as MongoDB stores and compares values."""
+    return bson.decode(bson.encode({"v": value}))["v"]
+
+
+def sort_spec(sort: Any) -> List[Tuple[str, int]]:
+    if not sort:
+        return []
+    items = sort.items() if hasattr(sort, "items") else sort
+    return [(field, int(direction)) for field, direction in items]
+
+
+def sort_docs(
+    docs: List[Any],
+    sort: List[Tuple[str, int]],
+    document: Callable[[Any], Document] = lambda doc: doc,
+) -> List[Any]:
+    # stable sorts from the last field to the first
+    for field, direction in reversed(sort):
+        docs.sort(
+            key=lambda doc: sort_key(first(document(doc), field)),
+            reverse=direction < 0,
+        )
+    return docs
+
+
+def values(doc: Any, path: str) -> List[Any]:
+    """Values at a dotted path, arrays are traversed. Empty when missing."""
+    current = [doc]
+    for part in path.split("."):
+        found = []
+        for item in current:
+            if isinstance(item, dict):
+                if part in item:
+                    found.append(item[part])
+            elif isinstance(item, list):
+                found.extend(
+                    element[part]
+                    for element in item
+                    if isinstance(element, dict) and part in element
+                )
+        current = found
+    return current
+
+
+def first(doc: Any, path: str) -> Any:
+    found = values(doc, path)
+    return found[0] if found else None
+
+
+def equals(candidate: Any, value: Any) -> bool:
+    if isinstance(candidate, list) and not isinstance(value, list):
+        return any(sort_key(item) == sort_key(value) for item in candidate)
+    return sort_key(candidate) == sort_key(value)
+
+
+def compare(candidate: Any, value: Any, op: Callable[[Any, Any], bool]) -> bool:
+    items = candidate if isinstance(candidate, list) else [candidate]
+    target = sort_key(value)
+    for item in items:
+        key = sort_key(item)
+        # like MongoDB, only values of the same type bracket compare
+        if key[0] == target[0] and op(key, target):
+            return True
+    return False
+
+
+def is_operator(condition: Any) -> bool:
+    return (
+        isinstance(condition, dict)
+        and bool(condition)
+        and all(key.startswith("$") for key in condition)
+    )
+
+
+def match_condition(found: List[Any], condition: Any) -> bool:
+    if not is_operator(condition):
+        if not found:
+            return condition is None
+        return any(equals(candidate, condition) for candidate in found)
+
+    for op, value in condition.items():
+        if op in COMPARISONS:
+            ok = any(compare(item, value, COMPARISONS[op]) for item in found)
+        elif op == "$in":
+            ok = any(
+                (not found and item is None)
+                or any(equals(candidate, item) for candidate in found)
+                for item in value
+            )
+        elif op == "$nin":
+            ok = not match_condition(found, {"$in": value})
+        else:
+            raise OperationFailure(f"unknown operator: {op}", 2)
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc: Document, query: Document) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            ok = all(matches(doc, clause) for clause in condition)
+        elif key == "$or":
+            ok = any(matches(doc, clause) for clause in condition)
+        elif key == "$text":
+            continue  # resolved against the text index by the caller
+        elif key.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {key}", 2)
+        else:
+            ok = match_condition(values(doc, key), condition)
+        if not ok:
+            return False
+    return True
+
+
+def equalities(query: Document) -> Dict[str, Any]:
+    """Fields a query pins to one value, at the top level or in ``$and``."""
+    pinned: Dict[str, Any] = {}
+    for key, condition in query.items():
+        if key == "$and":
+            for clause in condition:
+                pinned.update(equalities(clause))
+        elif not key.startswith("$") and not is_operator(condition):
+            pinned[key] = condition
+    return pinned
+
+
+def ranges(query: Document, field: str) -> Dict[str, Any]:
+    """Range operators on ``field`` at the top level or in ``$and``."""
+    bounds: Dict[str, Any] = {}
+    condition = query.get(field)
+    if is_operator(condition):
+        bounds.update(
+            (op, value) for op, value in condition.items() if op in COMPARISONS
+        )
+    for clause in query.get("$and", []):
+        bounds.update(ranges(clause, field))
+    return bounds
+
+
+def project(doc: Document, projection: Optional[Document]) -> Document:
+    """Apply an inclusion projection, ``_id`` is kept unless excluded."""
+    if not projection:
+        return doc
+    projected = {}
+    if projection.get("_id", True) and "_id" in doc:
+        projected["_id"] = doc["_id"]
+    for path, include in projection.items():
+        if path != "_id" and include:
+            copy_path(doc, projected, path)
+    return projected
+
+
+def copy_path(source: Document, target: Document, path: str) -> None:
+    head, _, rest = path.partition(".")
+    if head not in source:
+        return
+    if not rest:
+        target[head] = source[head]
+    elif isinstance(source[head], dict):
+        copy_path(source[head], target.setdefault(head, {}), rest)
+
+
+def apply_update(doc: Document, update: Document) -> Document:
+    """Apply ``update`` to ``doc`` in place, a replacement when it has no operators."""
+    if not any(key.startswith("$") for key in update):
+        replaced = dict(update)
+        if "_id" in doc:
+            replaced["_id"] = doc["_id"]
+        return replaced
+
+    for op, fields in update.items():
+        if op not in ("$set", "$inc"):
+            raise WriteError(f"Unknown modifier: {op}", 9)
+        for path, value in fields.items():
+            if path == "_id" and doc.get("_id") != value:
+                raise WriteError(
+                    "Performing an update on the path '_id' would modify "
+                    "the immutable field '_id'",
+                    66,
+                )
+            set_path(doc, op, path, value)
+    return doc
+
+
+def set_path(doc: Document, op: str, path: str, value: Any) -> None:
+    *parts, last = path.split(".")
+    for part in parts:
+        doc = doc.setdefault(part, {})
+        if not isinstance(doc, dict):
+            raise WriteError(f"Cannot create field '{last}' in element {part}", 28)
+
+    if op == "$inc":
+        current = doc.get(last)
+        if current is None:
+            doc[last] = value
+        elif isinstance(current, (int, float)) and not isinstance(current, bool):
+            doc[last] = current + value
+        else:
+            raise WriteError("Cannot apply $inc to a value of non-numeric type", 14)
+    else:
+        doc[last] = value
+
+
+class Index:
+    """Declared index, ``key`` is a list of (field, direction) pairs."""
+
+    def __init__(self, name: str, key: List[Tuple[str, Any]], unique: bool) -> None:
+        self.name = name
+        self.key = key
+        self.unique = unique
+        self.fields = [field for field, _ in key]
+
+    def info(self) -> Document:
+        info: Document = dict(key=list(self.key), v=2)
+        if self.unique:
+            info["unique"] = True
+        return info
+
+    def add(self, entry: "Entry") -> None:
+        pass
+
+    def remove(self, entry: "Entry") -> None:
+        pass
+
+    def check(self, entry: "Entry") -> None:
+        pass
+
+
+class HashIndex(Index):
+    """Unique hash index, ``_id`` or a ``unique=True`` declaration."""
+
+    def __init__(self, name: str, key: List[Tuple[str, Any]], namespace: str) -> None:
+        super().__init__(name, key, unique=True)
+        self.namespace = namespace
+        self.entries: Dict[SortKey, "Entry"] = {}
+
+    def key_of(self, doc: Document) -> SortKey:
+        return tuple(sort_key(first(doc, field)) for field in self.fields)
+
+    def lookup(self, pinned: Dict[str, Any]) -> Optional["Entry"]:
+        return self.entries.get(tuple(sort_key(pinned[field]) for field in self.fields))
+
+    def check(self, entry: "Entry") -> None:
+        existing = self.entries.get(self.key_of(entry.doc))
+        if existing is not None and existing.seq != entry.seq:
+            dup_key = {field: first(entry.doc, field) for field in self.fields}
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.namespace} "
+                f"index: {self.name} dup key: {dup_key}",
+                11000,
+                dict(code=11000, keyPattern=dict(self.key), keyValue=dup_key),
+            )
+
+    def add(self, entry: "Entry") -> None:
+        self.entries[self.key_of(entry.doc)] = entry
+
+    def remove(self, entry: "Entry") -> None:
+        key = self.key_of(entry.doc)
+        if self.entries.get(key) is entry:
+            del self.entries[key]
+
+
+class SortedIndex(Index):
+    """Index keys kept sorted, scanned for equality prefixes and ranges."""
+
+    def __init__(self, name: str, key: List[Tuple[str, Any]]) -> None:
+        super().__init__(name, key, unique=False)
+        self.directions = [int(direction) for _, direction in key]
+        self.keys: List[Tuple[Tuple[Any, ...], int]] = []
+        self.entries: Dict[int, "Entry"] = {}
+
+    def component(self, value: Any, direction: int) -> Any:
+        key = sort_key(value)
+        return key if direction > 0 else Desc(key)
+
+    def key_of(self, doc: Document) -> Tuple[Any, ...]:
+        return tuple(
+            self.component(first(doc, field), direction)
+            for field, direction in zip(self.fields, self.directions)
+        )
+
+    def add(self, entry: "Entry") -> None:
+        insort(self.keys, (self.key_of(entry.doc), entry.seq))
+        self.entries[entry.seq] = entry
+
+    def remove(self, entry: "Entry") -> None:
+        item = (self.key_of(entry.doc), entry.seq)
+        position = bisect_left(self.keys, item)
+        if position < len(self.keys) and self.keys[position] == item:
+            del self.keys[position]
+        self.entries.pop(entry.seq, None)
+
+    def plan(
+        self, query: Document, sort: List[Tuple[str, int]]
+    ) -> Optional[Tuple[int, int, bool]]:
+        """Scan range and direction serving ``query`` in ``sort`` order, if any.
+
+        The index fits when its leading fields are pinned by equalities and the
+        remaining ones are exactly the sort, in the same or reversed directions.
+        """
+        pinned = equalities(query)
+        prefix = 0
+        while prefix < len(self.fields) and self.fields[prefix] in pinned:
+            prefix += 1
+        for size in range(prefix, -1, -1):
+            rest = list(zip(self.fields[size:], self.directions[size:]))
+            if sort and [field for field, _ in rest] != [field for field, _ in sort]:
+                continue
+            forward = all(d == s for (_, d), (_, s) in zip(rest, sort))
+            backward = all(d == -s for (_, d), (_, s) in zip(rest, sort))
+            if sort and not (forward or backward):
+                continue
+            low, high = self.scan_range(pinned, size, query)
+            return low, high, not sort or forward
+        return None
+
+    def scan_range(
+        self, pinned: Dict[str, Any], size: int, query: Document
+    ) -> Tuple[int, int]:
+        prefix = tuple(
+            self.component(pinned[field], direction)
+            for field, direction in zip(self.fields[:size], self.directions[:size])
+        )
+        # a key prefix sorts before the keys it starts, HIGH after them
+        low: Tuple[Any, ...] = prefix
+        high: Tuple[Any, ...] = prefix + (HIGH,)
+        if size < len(self.fields):
+            field, direction = self.fields[size], self.directions[size]
+            for op, value in ranges(query, field).items():
+                bound = prefix + (self.component(value, direction),)
+                strict = op in ("$gt", "$lt")
+                if (op in ("$gt", "$gte")) == (direction > 0):
+                    low = bound + (HIGH,) if strict else bound
+                else:
+                    high = bound if strict else bound + (HIGH,)
+        return bisect_left(self.keys, (low,)), bisect_left(self.keys, (high,))
+
+    def scan(self, low: int, high: int, forward: bool) -> Iterator["Entry"]:
+        positions = range(low, high) if forward else range(high - 1, low - 1, -1)
+        for position in positions:
+            # the list can change while a cursor is consumed, re-check the bound
+            if position >= len(self.keys):
+                break
+            yield self.entries[self.keys[position][1]]
+
+
+class TextIndex(Index):
+    """Term postings of the text indexed fields, scored by term frequency."""
+
+    def __init__(self, name: str, key: List[Tuple[str, Any]]) -> None:
+        super().__init__(name, key, unique=False)
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+
+    def info(self) -> Document:
+        return dict(
+            key=[("_fts", "text"), ("_ftsx", 1)],
+            weights={field: 1 for field in self.fields},
+            default_language="english",
+            textIndexVersion=3,
+            v=2,
+        )
+
+    def terms(self, doc: Document) -> Counter:
+        return Counter(
+            term
+            for field in self.fields
+            for text in values(doc, field)
+            if isinstance(text, str)
+            for term in tokenize(text)
+        )
+
+    def add(self, entry: "Entry") -> None:
+        for term, count in self.terms(entry.doc).items():
+            self.postings[term][entry.seq] = count
+
+    def remove(self, entry: "Entry") -> None:
+        for term in self.terms(entry.doc):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(entry.seq, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, text: str) -> Dict[int, float]:
+        """Scores of the entries containing any of the terms, by sequence number."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(text)):
+            for seq, count in self.postings.get(term, {}).items():
+                scores[seq] += 1 + math.log(count)
+        return scores
+
+
+class Entry:
+    """Stored document, BSON encoded and decoded."""
+
+    __slots__ = ("seq", "doc", "raw")
+
+    def __init__(self, seq: int, raw: bytes) -> None:
+        self.seq = seq
+        self.raw = raw
+        self.doc: Document = bson.decode(raw)
+
+    def copy(self, projection: Optional[Document] = None) -> Document:
+        """Fresh decoded copy, the caller may modify it."""
+        return project(bson.decode(self.raw), projection)
+
+
+class MemoryCursor:
+    """Lazily evaluated ``find`` or ``aggregate`` result."""
+
+    def __init__(self, produce: Callable[[], Iterable[Document]]) -> None:
+        self.produce = produce
+        self._results: Optional[Iterator[Document]] = None
+
+    def batch_size(self, batch_size: int) -> "MemoryCursor":
+        return self
+
+    def _iterate(self) -> Iterator[Document]:
+        if self._results is None:
+            self._results = iter(self.produce())
+        return self._results
+
+    def __aiter__(self) -> "MemoryCursor":
+        return self
+
+    async def __anext__(self) -> Document:
+        try:
+            return next(self._iterate())
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: Optional[int] = None) -> List[Document]:
+        results = self._iterate()
+        if length is None:
+            return list(results)
+        return [doc for _, doc in zip(range(length), results)]
+
+
+class Store:
+    """Documents and indexes of one collection."""
+
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self.seq = 0
+        # by sequence number, in insertion order
+        self.entries: Dict[int, Entry] = {}
+        self.id_index = HashIndex(ID_INDEX, [("_id", 1)], namespace)
+        # ranges and order of _id, the part of the _id index a hash cannot serve
+        self.id_order = SortedIndex(ID_INDEX, [("_id", 1)])
+        self.indexes: Dict[str, Index] = {ID_INDEX: self.id_index}
+
+    def maintained(self) -> List[Index]:
+        return [*self.indexes.values(), self.id_order]
+
+    def insert(self, doc: Document) -> Entry:
+        self.seq += 1
+        entry = Entry(self.seq, bson.encode(doc))
+        for index in self.indexes.values():
+            index.check(entry)
+        for index in self.maintained():
+            index.add(entry)
+        self.entries[entry.seq] = entry
+        return entry
+
+    def replace(self, entry: Entry, doc: Document) -> Entry:
+        updated = Entry(entry.seq, bson.encode(doc))
+        for index in self.indexes.values():
+            index.check(updated)
+        for index in self.maintained():
+            index.remove(entry)
+            index.add(updated)
+        self.entries[entry.seq] = updated
+        return updated
+
+    def delete(self, entry: Entry) -> None:
+        for index in self.maintained():
+            index.remove(entry)
+        del self.entries[entry.seq]
+
+    def candidates(
+        self, query: Document, sort: List[Tuple[str, int]]
+    ) -> Tuple[Iterable[Entry], bool]:
+        """Entries possibly matching ``query``, and whether they come sorted."""
+        pinned = equalities(query)
+        ids = query.get("_id")
+        if is_operator(ids) and list(ids) == ["$in"]:
+            found = (self.id_index.lookup({"_id": _id}) for _id in ids["$in"])
+            unique = {entry.seq: entry for entry in found if entry is not None}
+            return list(unique.values()), False
+
+        for index in self.indexes.values():
+            if isinstance(index, HashIndex) and all(f in pinned for f in index.fields):
+                entry = index.lookup(pinned)
+                return ([entry] if entry is not None else []), True
+
+        for index in self.maintained():
+            if isinstance(index, SortedIndex):
+                plan = index.plan(query, sort)
+                if plan is not None and (sort or plan[:2] != (0, len(index.keys))):
+                    return index.scan(*plan), True
+
+        return list(self.entries.values()), not sort
+
+
+class MemoryCollection:
+    """Motor style collection over a :class:`Store`."""
+
+    def __init__(self, name: str, store: Store) -> None:
+        self.name = name
+        self.store = store
+
+    def _select(
+        self,
+        query: Optional[Document],
+        sort: List[Tuple[str, int]] = [],
+        skip: int = 0,
+        limit: int = 0,
+        scores: Optional[Dict[int, float]] = None,
+    ) -> Iterator[Entry]:
+        """Matching entries in ``sort`` order, or insertion order without one.
+
+        The text score of every entry matching a ``$text`` query is put in
+        ``scores`` by entry sequence number.
+        """
+        query = normalize(query or {})
+        text = query.get("$text")
+        if text is not None:
+            found = self._text_scores(text["$search"])
+            if scores is not None:
+                scores.update(found)
+
+        entries, ordered = self.store.candidates(query, sort)
+        selected: Iterable[Entry] = (
+            entry
+            for entry in entries
+            if (text is None or entry.seq in found) and matches(entry.doc, query)
+        )
+        if not ordered:
+            selected = sorted(selected, key=lambda entry: entry.seq)
+            sort_docs(selected, sort, lambda entry: entry.doc)
+
+        for position, entry in enumerate(selected):
+            if position < skip:
+                continue
+            yield entry
+            if limit and position + 1 >= skip + limit:
+                break
+
+    def _text_scores(self, search: str) -> Dict[int, float]:
+        for index in self.store.indexes.values():
+            if isinstance(index, TextIndex):
+                return index.search(search)
+        raise OperationFailure("text index required for $text query", 27)
+
+    def find(
+        self,
+        filter: Optional[Document] = None,
+        projection: Optional[Document] = None,
+        skip: int = 0,
+        limit: int = 0,
+        sort: Any = None,
+    ) -> MemoryCursor:
+        def produce() -> Iterator[Document]:
+            for entry in self._select(filter, sort_spec(sort), skip, limit):
+                yield entry.copy(projection)
+
+        return MemoryCursor(produce)
+
+    async def find_one(
+        self, filter: Optional[Document] = None, projection: Optional[Document] = None
+    ) -> Optional[Document]:
+        for entry in self._select(filter, limit=1):
+            return entry.copy(projection)
+        return None
+
+    async def count_documents(self, filter: Document, limit: int = 0) -> int:
+        return sum(1 for _ in self._select(filter, limit=limit))
+
+    async def insert_one(self, document: Document) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        self.store.insert(document)
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(
+        self, documents: Iterable[Document], ordered: bool = True
+    ) -> InsertManyResult:
+        documents = list(documents)
+        await self.bulk_write(
+            [InsertOne(document) for document in documents], ordered=ordered
+        )
+        return InsertManyResult([document["_id"] for document in documents], True)
+
+    async def bulk_write(
+        self, requests: List[Any], ordered: bool = True
+    ) -> BulkWriteResult:
+        outcome: Document = dict(
+            writeErrors=[],
+            writeConcernErrors=[],
+            nInserted=0,
+            nUpserted=0,
+            nMatched=0,
+            nModified=0,
+            nRemoved=0,
+            upserted=[],
+        )
+        for position, request in enumerate(requests):
+            try:
+                self._write(request, position, outcome)
+            except WriteError as error:
+                outcome["writeErrors"].append(
+                    dict(index=position, code=error.code, errmsg=str(error))
+                )
+                if ordered:
+                    break
+
+        if outcome["writeErrors"]:
+            raise BulkWriteError(outcome)
+        return BulkWriteResult(outcome, True)
+
+    def _write(self, request: Any, position: int, outcome: Document) -> None:
+        if isinstance(request, InsertOne):
+            request._doc.setdefault("_id", ObjectId())
+            self.store.insert(request._doc)
+            outcome["nInserted"] += 1
+        elif isinstance(request, (UpdateOne, ReplaceOne)):
+            matched, modified, upserted_id = self._update(
+                request._filter, request._doc, bool(request._upsert)
+            )
+            outcome["nMatched"] += matched
+            outcome["nModified"] += modified
+            if upserted_id is not None:
+                outcome["nUpserted"] += 1
+                outcome["upserted"].append(dict(index=position, _id=upserted_id))
+        else:
+            raise TypeError(f"{request!r} is not a supported request")
+
+    def _update(
+        self, query: Document, update: Document, upsert: bool
+    ) -> Tuple[int, int, Any]:
+        update = normalize(update)
+        entry = next(self._select(query, limit=1), None)
+        if entry is not None:
+            doc = apply_update(bson.decode(entry.raw), update)
+            if bson.encode(doc) == entry.raw:
+                return 1, 0, None
+            self.store.replace(entry, doc)
+            return 1, 1, None
+        if not upsert:
+            return 0, 0, None
+
+        doc = apply_update(normalize(equalities(query)), update)
+        doc.setdefault("_id", ObjectId())
+        self.store.insert(doc)
+        return 0, 0, doc["_id"]
+
+    async def update_one(
+        self, filter: Document, update: Document, upsert: bool = False
+    ) -> UpdateResult:
+        matched, modified, upserted_id = self._update(filter, update, upsert)
+        raw: Document = dict(n=matched or int(upserted_id is not None), ok=1.0)
+        raw["nModified"] = modified
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def delete_many(self, filter: Document) -> DeleteResult:
+        entries = list(self._select(filter))
+        for entry in entries:
+            self.store.delete(entry)
+        return DeleteResult(dict(n=len(entries), ok=1.0), True)
+
+    async def find_one_and_update(
+        self,
+        filter: Document,
+        update: Document,
+        projection: Optional[Document] = None,
+    ) -> Optional[Document]:
+        """Update the first match, returns it as it was before the update."""
+        entry = next(self._select(filter, limit=1), None)
+        if entry is None:
+            return None
+        self.store.replace(entry, apply_update(entry.copy(), normalize(update)))
+        return entry.copy(projection)
+
+    async def find_one_and_delete(
+        self, filter: Document, projection: Optional[Document] = None
+    ) -> Optional[Document]:
+        entry = next(self._select(filter, limit=1), None)
+        if entry is None:
+            return None
+        self.store.delete(entry)
+        return entry.copy(projection)
+
+    def aggregate(self, pipeline: List[Document]) -> MemoryCursor:
+        return MemoryCursor(lambda: normalize(self._aggregate(pipeline)))
+
+    def _aggregate(self, pipeline: List[Document]) -> List[Document]:
+        stages = [next(iter(stage.items())) for stage in pipeline]
+        query: Document = {}
+        if stages and stages[0][0] == "$match":
+            query = stages.pop(0)[1]
+
+        text_scores: Dict[int, float] = {}
+        entries = list(self._select(query, scores=text_scores))
+        docs = [entry.copy() for entry in entries]
+        scores = [text_scores.get(entry.seq) for entry in entries]
+
+        for name, spec in stages:
+            if name == "$match":
+                docs = [doc for doc in docs if matches(doc, normalize(spec))]
+            elif name == "$addFields":
+                for doc, score in zip(docs, scores):
+                    for path, expression in spec.items():
+                        set_path(doc, "$set", path, evaluate(doc, expression, score))
+            elif name == "$sort":
+                docs = sort_docs(docs, sort_spec(spec))
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$group":
+                docs = group(docs, spec)
+            else:
+                raise OperationFailure(
+                    f"Unrecognized pipeline stage name: '{name}'", 40324
+                )
+        return docs
+
+    async def create_indexes(self, indexes: List[IndexModel]) -> List[str]:
+        return [self._create_index(index.document) for index in indexes]
+
+    async def create_index(self, keys: Any, **kwargs: Any) -> str:
+        return self._create_index(IndexModel(keys, **kwargs).document)
+
+    def _create_index(self, document: Document) -> str:
+        name = document["name"]
+        key = list(document["key"].items())
+        unique = bool(document.get("unique", False))
+        existing = self.store.indexes.get(name)
+        if existing is not None:
+            if existing.key != key or existing.unique != unique:
+                raise OperationFailure(
+                    f"An existing index has the same name as the requested index: {name}",
+                    86,
+                )
+            return name
+
+        index: Index
+        if any(direction == "text" for _, direction in key):
+            index = TextIndex(name, key)
+        elif unique:
+            index = HashIndex(name, key, self.store.namespace)
+        else:
+            index = SortedIndex(name, key)
+
+        for entry in self.store.entries.values():
+            index.check(entry)
+            index.add(entry)
+        self.store.indexes[name] = index
+        return name
+
+    async def index_information(self) -> Dict[str, Document]:
+        return {name: index.info() for name, index in self.store.indexes.items()}
+
+
+def evaluate(doc: Document, expression: Any, score: Optional[float] = None) -> Any:
+    if isinstance(expression, str) and expression.startswith("$"):
+        return first(doc, expression[1:])
+    if expression == {"$meta": "textScore"}:
+        if score is None:
+            raise OperationFailure("query requires text score metadata", 40218)
+        return score
+    if is_operator(expression):
+        raise OperationFailure(
+            f"Unrecognized expression '{next(iter(expression))}'", 168
+        )
+    if isinstance(expression, dict):
+        return {key: evaluate(doc, value, score) for key, value in expression.items()}
+    return expression
+
+
+def group(docs: List[Document], spec: Document) -> List[Document]:
+    groups: Dict[SortKey, Document] = {}
+    for doc in docs:
+        key = evaluate(doc, spec["_id"])
+        result = groups.setdefault(sort_key(key), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            ((op, expression),) = accumulator.items()
+            if op != "$sum":
+                raise OperationFailure(f"unknown group operator '{op}'", 15952)
+            value = evaluate(doc, expression)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                value = 0
+            result[field] = result.get(field, 0) + value
+    return list(groups.values())
+
+
+class MemoryDatabase:
+    """Motor style database of :class:`MemoryCollection`."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.stores: Dict[str, Store] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        store = self.stores.get(name)
+        if store is None:
+            store = self.stores[name] = Store(f"{self.name}.{name}")
+        return MemoryCollection(name, store)
+
+
+class MemoryEngine:
+    """The in-memory databases of the process, by name."""
+
+    databases: Dict[str, MemoryDatabase] = {}
+
+    @classmethod
+    def database(cls, db_name: str) -> MemoryDatabase:
+        database = cls.databases.get(db_name)
+        if database is None:
+            database = cls.databases[db_name] = MemoryDatabase(db_name)
+        return database
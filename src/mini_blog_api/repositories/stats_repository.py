@@ -0,0 +1,145 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Union
+
+import structlog
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
+
+from ..models.card_model import CardStats, CardStatusLabel
+
+log = structlog.get_logger()
+
+# Counter document holding the totals over every card.
+ALL_CARDS = "all"
+
+CounterId = Union[str, ObjectId]
+
+
+class CardStatsRepository:
+    """Card counts per category and status, kept in the ``card_stats`` collection.
+
+    There is one counter document per category plus one for all cards, each with
+    a ``total`` and a count per status, so a read is a single ``_id`` lookup. Card
+    writes adjust the counters with ``$inc`` and :meth:`reconcile` recomputes
+    them from the cards collection to repair any drift.
+    """
+
+    @classmethod
+    def initialize(cls, db: AsyncIOMotorClient) -> None:
+        cls.collection = db["card_stats"]
+        cls.cards = db["cards"]
+
+    @classmethod
+    async def find_one(cls, counter_id: CounterId) -> CardStats:
+        try:
+            doc: Optional[Dict[str, Any]] = await cls.collection.find_one(
+                {"_id": counter_id}
+            )
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
+
+        doc = doc or {}
+        statuses = doc.get("statuses", {})
+        return CardStats(
+            total=doc.get("total", 0),
+            statuses={
+                label.value: statuses.get(label.value, 0) for label in CardStatusLabel
+            },
+        )
+
+    @classmethod
+    async def record(
+        cls,
+        removed: Iterable[Mapping[str, Any]] = (),
+        added: Iterable[Mapping[str, Any]] = (),
+    ) -> None:
+        """Adjust the counters for ``removed`` and ``added`` cards.
+
+        Cards only need their ``category`` and ``status``; an update is recorded as
+        removing the old version and adding the new one. Failures are logged and
+        left to :meth:`reconcile`, a card write never fails on its counters.
+        """
+        increments: Dict[CounterId, Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        for delta, cards in ((-1, removed), (1, added)):
+            for card in cards:
+                status = getattr(card["status"], "value", card["status"])
+                for counter_id in (ALL_CARDS, card["category"]):
+                    increments[counter_id]["total"] += delta
+                    increments[counter_id][f"statuses.{status}"] += delta
+
+        now = datetime.utcnow()
+        requests: List[UpdateOne] = []
+        for counter_id, fields in increments.items():
+            changed = {field: value for field, value in fields.items() if value}
+            if changed:
+                requests.append(
+                    UpdateOne(
+                        {"_id": counter_id},
+                        {"$inc": changed, "$set": {"updated_at": now}},
+                        upsert=True,
+                    )
+                )
+
+        if not requests:
+            return
+
+        try:
+            await cls.collection.bulk_write(requests, ordered=False)
+
+        except PyMongoError as error:
+            log.error("card stats update failed", error=str(error))
+
+    @classmethod
+    async def reconcile(cls) -> int:
+        """Recompute every counter from the cards collection.
+
+        Increments racing with the recount may be lost until the next run. Returns
+        the number of counter documents written.
+        """
+        try:
+            counters: Dict[CounterId, Dict[str, Any]] = {}
+            pipeline = [
+                {
+                    "$group": {
+                        "_id": {"category": "$category", "status": "$status"},
+                        "count": {"$sum": 1},
+                    }
+                }
+            ]
+            async for group in cls.cards.aggregate(pipeline):
+                for counter_id in (ALL_CARDS, group["_id"]["category"]):
+                    counter = counters.setdefault(
+                        counter_id, {"total": 0, "statuses": {}}
+                    )
+                    counter["total"] += group["count"]
+                    statuses = counter["statuses"]
+                    status = group["_id"]["status"]
+                    statuses[status] = statuses.get(status, 0) + group["count"]
+
+            now = datetime.utcnow()
+            requests = [
+                ReplaceOne(
+                    {"_id": counter_id},
+                    dict(counter, updated_at=now),
+                    upsert=True,
+                )
+                for counter_id, counter in counters.items()
+            ]
+            if requests:
+                await cls.collection.bulk_write(requests, ordered=False)
+            await cls.collection.delete_many({"_id": {"$nin": list(counters)}})
+
+            log.msg("card stats reconciled", counters=len(counters))
+            return len(counters)
+
+        except ServerSelectionTimeoutError as error:
+            log.error(error)
+            raise HTTPException(500, "Failed to connect to MongoDB.")
@@ -0,0 +1,91 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional, Sequence
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .config import Settings, get_settings
+from .services.serializer import dumps
+
+settings: Settings = get_settings()
+
+
+class JSONBytesResponse(Response):
+    """JSON response for content already encoded, or encodable, by the fast path."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def entity_tag(data: bytes) -> str:
+    return 'W/"%s"' % hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def opaque_tag(tag: str) -> str:
+    """Entity tag without its weak indicator, for weak comparison."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime]
+) -> bool:
+    """Evaluate ``If-None-Match``, or else ``If-Modified-Since``, as in RFC 7232."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {opaque_tag(tag) for tag in if_none_match.split(",")}
+        return "*" in tags or opaque_tag(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    content: Any,
+    version: Optional[Sequence[Any]] = None,
+    last_modified: Optional[datetime] = None,
+) -> Response:
+    """JSON response for ``content`` honoring conditional request headers.
+
+    With a ``version``, e.g. the ``_id`` and ``updated_at`` of a document, the ETag
+    is derived from it and the request query, so a 304 is answered without
+    encoding ``content``. Otherwise the ETag hashes the encoded body.
+    """
+    body: Optional[bytes] = None
+    if version is not None:
+        etag = entity_tag(repr((list(version), request.url.query)).encode("utf-8"))
+    else:
+        body = content if isinstance(content, bytes) else dumps(content)
+        etag = entity_tag(body)
+
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": settings.cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    return JSONBytesResponse(body if body is not None else content, headers=headers)
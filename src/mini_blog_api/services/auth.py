@@ -1,31 +1,95 @@
+import asyncio
 import secrets
 import string
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Callable, Optional
 
 import bcrypt
 import jwt
+from fastapi import HTTPException
 
 from ..config import Settings, get_settings
 
 settings: Settings = get_settings()
 
 
+class AuthExecutor:
+    """Bounded thread pool for CPU bound auth work such as bcrypt.
+
+    bcrypt releases the GIL, so hashing in threads keeps the event loop responsive.
+    Calls beyond ``max_workers + queue_limit`` in flight are rejected with 503.
+    """
+
+    def __init__(self, max_workers: int, queue_limit: int) -> None:
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_workers + self.queue_limit:
+            raise HTTPException(
+                status_code=503, detail="Authentication service is busy."
+            )
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="auth"
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        """Stop the pool without blocking, in-flight calls finish in their threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+auth_executor = AuthExecutor(
+    max_workers=settings.auth_workers, queue_limit=settings.auth_queue_limit
+)
+
+
 def generate_pwd():
     characters = string.ascii_letters + string.digits + string.punctuation
     password = "".join(
         secrets.choice(characters) for _ in range(settings.password_length)
     )
 
-    return hash_password(password)
+    return password
 
 
-def hash_password(plaintext: str):
-    salt = bcrypt.gensalt()
+def _hash_password(plaintext: str) -> str:
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
     hashed_pwd = bcrypt.hashpw(plaintext.encode("utf-8"), salt)
 
     return hashed_pwd.decode("utf-8")
 
 
+def _check_password(plain_pwd: str, hashed_pwd: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain_pwd.encode("utf-8"), hashed_pwd.encode("utf-8"))
+    except ValueError:
+        # stored value is not a bcrypt hash
+        return False
+
+
+async def hash_password(plaintext: str) -> str:
+    return await auth_executor.run(_hash_password, plaintext)
+
+
+async def verify_password(plain_pwd: str, hashed_pwd: str) -> bool:
+    return await auth_executor.run(_check_password, plain_pwd, hashed_pwd)
+
+
 def generate_access_token(account: dict):
     to_encode = account.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.token_exp)
@@ -33,7 +97,3 @@ def generate_access_token(account: dict):
     encode_jwt = jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_alg)
 
     return encode_jwt
-
-
-def verify_password(plain_pwd: str, hashed_pwd: str) -> bool:
-    return plain_pwd == hashed_pwd
@@ -0,0 +1,104 @@
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    TypeVar,
+    Union,
+)
+from weakref import WeakKeyDictionary
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class Batch(Generic[K, V]):
+    __slots__ = ("futures", "handle")
+
+    def __init__(self) -> None:
+        self.futures: Dict[K, "asyncio.Future[Optional[V]]"] = {}
+        self.handle: Optional[Union[asyncio.Handle, asyncio.TimerHandle]] = None
+
+
+class BatchLoader(Generic[K, V]):
+    """DataLoader style batching of lookups by key.
+
+    Keys requested within ``window`` seconds of the first one, or in the same event
+    loop iteration when ``window`` is 0, are resolved together by one ``load_many``
+    call, which returns the found values by key. A batch is dispatched early once
+    it holds ``max_batch_size`` distinct keys. Batches are kept per event loop.
+    """
+
+    def __init__(
+        self,
+        load_many: Callable[[List[K]], Awaitable[Mapping[K, V]]],
+        window: float = 0.0,
+        max_batch_size: int = 100,
+    ) -> None:
+        self.load_many = load_many
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.loads = 0
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._pending: "WeakKeyDictionary[asyncio.AbstractEventLoop, Batch[K, V]]" = (
+            WeakKeyDictionary()
+        )
+
+    async def load(self, key: K) -> Optional[V]:
+        """Value of ``key``, None when ``load_many`` did not find it."""
+        self.loads += 1
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(loop)
+        if batch is None:
+            batch = self._pending[loop] = Batch()
+            if self.window > 0:
+                batch.handle = loop.call_later(self.window, self._dispatch, loop)
+            else:
+                batch.handle = loop.call_soon(self._dispatch, loop)
+
+        future = batch.futures.get(key)
+        if future is None:
+            future = batch.futures[key] = loop.create_future()
+            if len(batch.futures) >= self.max_batch_size:
+                self._dispatch(loop)
+
+        # shielded, callers of the same key share the future
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return dict(batches=self.batches, loads=self.loads)
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        batch = self._pending.pop(loop, None)
+        if batch is None:
+            return
+        if batch.handle is not None:
+            batch.handle.cancel()
+        self.batches += 1
+        task = loop.create_task(self._resolve(batch.futures))
+        self._tasks.add(task)  # the loop only keeps weak references to tasks
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, futures: Dict[K, "asyncio.Future[Optional[V]]"]) -> None:
+        try:
+            values = await self.load_many(list(futures))
+        except asyncio.CancelledError:
+            for future in futures.values():
+                future.cancel()
+            raise
+        except Exception as error:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(values.get(key))
@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """Bounded in-process LRU cache with per-entry expiry.
+
+    Entries expire either after the cache wide ``ttl`` or at an explicit
+    ``expires_at`` timestamp given to :meth:`set`. Expired entries are dropped lazily
+    on access; the least recently used entry is evicted once ``maxsize`` is reached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(
+        self, key: Hashable, value: Any, expires_at: Optional[float] = None
+    ) -> None:
+        if self.maxsize <= 0:
+            return
+        if expires_at is None and self.ttl is not None:
+            expires_at = self.clock() + self.ttl
+        self.pop(key)
+        self._data[key] = (value, expires_at)
+        self._added(value)
+        while self._data and self._full():
+            _, (evicted, _) = self._data.popitem(last=False)
+            self._removed(evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self._removed(entry[0])
+        return entry[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return dict(
+            size=len(self._data),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self.clock():
+            self.pop(key)
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _full(self) -> bool:
+        return len(self._data) > self.maxsize
+
+    def _added(self, value: Any) -> None:
+        pass
+
+    def _removed(self, value: Any) -> None:
+        pass
+
+
+class SizedLRUCache(LRUCache):
+    """:class:`LRUCache` bounded by the total ``sizeof`` of its values, in bytes."""
+
+    def __init__(
+        self,
+        maxbytes: int,
+        sizeof: Callable[[Any], int] = len,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__(maxsize=maxbytes, ttl=ttl, clock=clock)
+        self.sizeof = sizeof
+        self.nbytes = 0
+
+    def set(
+        self, key: Hashable, value: Any, expires_at: Optional[float] = None
+    ) -> None:
+        if self.sizeof(value) > self.maxsize:
+            self.pop(key)  # would evict everything else and still not fit
+            return
+        super().set(key, value, expires_at)
+
+    def clear(self) -> None:
+        super().clear()
+        self.nbytes = 0
+
+    def stats(self) -> dict:
+        return dict(super().stats(), nbytes=self.nbytes)
+
+    def _full(self) -> bool:
+        return self.nbytes > self.maxsize
+
+    def _added(self, value: Any) -> None:
+        self.nbytes += self.sizeof(value)
+
+    def _removed(self, value: Any) -> None:
+        self.nbytes -= self.sizeof(value)
+
+
+_MISSING = object()
@@ -0,0 +1,99 @@
+import gzip
+from typing import Any, Hashable, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from ..config import Settings, get_settings
+from ..responses import JSONBytesResponse, entity_tag, is_not_modified
+from .cache import SizedLRUCache
+from .serializer import dumps
+
+settings: Settings = get_settings()
+
+# Bodies smaller than this are not worth storing compressed.
+GZIP_MIN_SIZE = 1024
+
+
+class CachedResponse:
+    """Encoded JSON body of a response with its ETag and optional gzip variant."""
+
+    __slots__ = ("body", "gzip_body", "etag")
+
+    def __init__(self, body: bytes, compress: bool = False) -> None:
+        self.body = body
+        self.etag = entity_tag(body)
+        self.gzip_body: Optional[bytes] = None
+        if compress and len(body) >= GZIP_MIN_SIZE:
+            self.gzip_body = gzip.compress(body, compresslevel=6)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + len(self.gzip_body or b"")
+
+    def response(self, request: Request, hit: bool) -> Response:
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": settings.cache_control,
+            "X-Cache": "HIT" if hit else "MISS",
+        }
+        if is_not_modified(request, self.etag, None):
+            return Response(status_code=304, headers=headers)
+
+        if self.gzip_body is not None:
+            headers["Vary"] = "Accept-Encoding"
+            if "gzip" in request.headers.get("accept-encoding", ""):
+                headers["Content-Encoding"] = "gzip"
+                return JSONBytesResponse(self.gzip_body, headers=headers)
+        return JSONBytesResponse(self.body, headers=headers)
+
+
+class ResponseCache:
+    """Pre-encoded list responses keyed by route, query parameters and generation.
+
+    Callers pass the ``generation`` of the repositories a response was read from;
+    every repository write bumps it, so cached responses of older generations are
+    never hit again and age out of the byte bounded LRU. Writes made by other
+    processes become visible once entries reach the TTL.
+    """
+
+    def __init__(self, maxbytes: int, ttl: float, compress: bool = True) -> None:
+        self.entries = SizedLRUCache(
+            maxbytes=maxbytes, sizeof=lambda entry: entry.nbytes, ttl=ttl
+        )
+        self.compress = compress
+
+    @staticmethod
+    def key(request: Request, generation: Hashable) -> Tuple[Hashable, ...]:
+        """Normalize the route and query, parameter order and empty values aside."""
+        query = tuple(
+            sorted(
+                (name, value)
+                for name, value in request.query_params.multi_items()
+                if value != ""
+            )
+        )
+        return (request.url.path, query, generation)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        return self.entries.get(key)
+
+    def set(self, key: Hashable, content: Any) -> CachedResponse:
+        entry = CachedResponse(
+            content if isinstance(content, bytes) else dumps(content), self.compress
+        )
+        self.entries.set(key, entry)
+        return entry
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+
+response_cache = ResponseCache(
+    maxbytes=settings.response_cache_max_bytes,
+    ttl=settings.response_cache_ttl,
+    compress=settings.response_cache_gzip,
+)
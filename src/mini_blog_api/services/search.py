@@ -0,0 +1,48 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Hashable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """In-memory term index scoring documents with TF-IDF.
+
+    Stands in for the Mongo text index where ``$text`` is not available, e.g. a
+    collection without the text index or the test database. Like ``$text`` a
+    document matches when it contains any of the query terms; stemming, phrases
+    and negations are not supported.
+    """
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Dict[Hashable, int]] = defaultdict(dict)
+        self.size = 0
+
+    def add(self, doc_id: Hashable, *texts: Any) -> None:
+        self.size += 1
+        terms = Counter(
+            term for text in texts if isinstance(text, str) for term in tokenize(text)
+        )
+        for term, count in terms.items():
+            self.postings[term][doc_id] = count
+
+    def search(self, query: str) -> List[Tuple[float, Hashable]]:
+        """Matching document ids with their score, best match first."""
+        scores: Dict[Hashable, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + self.size / len(postings))
+            for doc_id, count in postings.items():
+                scores[doc_id] += (1 + math.log(count)) * idf
+
+        return sorted(
+            ((score, doc_id) for doc_id, score in scores.items()),
+            key=lambda match: (-match[0], match[1]),
+        )
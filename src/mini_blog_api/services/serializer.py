@@ -0,0 +1,20 @@
+from typing import Any
+
+from bson.objectid import ObjectId
+from pydantic_core import to_json
+
+
+def bson_fallback(obj: Any) -> Any:
+    """Convert the BSON values the JSON encoder does not know natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode trusted database documents straight to JSON bytes.
+
+    Documents are not validated against the models. ObjectIds become strings and
+    datetimes ISO 8601 strings, matching the output of the Pydantic models.
+    """
+    return to_json(obj, fallback=bson_fallback)
@@ -0,0 +1,70 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight call.
+
+    Callers arriving while a call for their key is running await its result instead
+    of starting their own, so a burst of identical reads costs one database round
+    trip. Nothing is kept once the call finishes, later callers always read fresh
+    data. The shared call runs as its own task, cancelling one caller does not
+    cancel it for the others.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        flights.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # retrieved here in case every caller was cancelled
+
+    def stats(self) -> dict:
+        return dict(
+            calls=self.calls, coalesced=self.coalesced, inflight=len(self._inflight)
+        )
+
+
+flights: List[SingleFlight] = []
+
+
+def render_metrics() -> str:
+    """Coalescing counters of every :class:`SingleFlight` in Prometheus format."""
+    lines = [
+        "# HELP singleflight_calls_total Reads requested through single-flight.",
+        "# TYPE singleflight_calls_total counter",
+    ]
+    lines.extend(
+        f'singleflight_calls_total{{group="{flight.name}"}} {flight.calls}'
+        for flight in flights
+    )
+    lines.extend(
+        [
+            "# HELP singleflight_coalesced_total Reads served by another in-flight read.",
+            "# TYPE singleflight_coalesced_total counter",
+        ]
+    )
+    lines.extend(
+        f'singleflight_coalesced_total{{group="{flight.name}"}} {flight.coalesced}'
+        for flight in flights
+    )
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,13 @@
+import base64
+import binascii
 from copy import deepcopy
 from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Type
 
+import bson.json_util
 from bson import ObjectId
+from fastapi import HTTPException
+from pydantic import BaseModel
 
 
 def strtolist(string):
@@ -35,3 +41,92 @@ def sanitize(keyval):
                 val = [sanitize(each) for each in val]
             keyval[key] = val
     return keyval
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode keyset pagination values (e.g. last ``_id``) into an opaque cursor."""
+    payload = bson.json_util.dumps(list(values)).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Raises ValueError when the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = bson.json_util.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as error:
+        raise ValueError("Invalid cursor") from error
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page_after(cursor: Optional[str]) -> Optional[ObjectId]:
+    """Resolve the ``cursor`` query parameter of list endpoints to the last seen ``_id``."""
+    if not cursor:
+        return None
+
+    try:
+        (last_id,) = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    if not isinstance(last_id, ObjectId):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return last_id
+
+
+def keyset_after(cursor: Optional[str], *types: Any) -> Optional[Tuple[Any, ...]]:
+    """Resolve a multi-value keyset cursor, checking each value against ``types``."""
+    if not cursor:
+        return None
+
+    try:
+        values = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    if len(values) != len(types) or not all(
+        isinstance(value, value_type) for value, value_type in zip(values, types)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return tuple(values)
+
+
+def next_page_cursor(docs: Sequence[Any], limit: Optional[int]) -> Optional[str]:
+    """Cursor for the page following ``docs``, None when this is the last page.
+
+    ``docs`` may hold models or plain documents.
+    """
+    if not docs or not limit or len(docs) < limit:
+        return None
+    last = docs[-1]
+    return encode_cursor(last["_id"] if isinstance(last, Mapping) else last.id)
+
+
+def field_projection(
+    model: Type[BaseModel], fields: Optional[str]
+) -> Optional[Dict[str, int]]:
+    """Map the comma separated ``fields`` query parameter to a Mongo projection.
+
+    Fields may be given by name or alias, ``_id`` is always included.
+    """
+    if not fields:
+        return None
+
+    aliases = {name: field.alias or name for name, field in model.model_fields.items()}
+    aliases.update({alias: alias for alias in aliases.values()})
+
+    projection = {"_id": 1}
+    for field in strtolist(fields):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in aliases:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{field}'.")
+        projection[aliases[field]] = 1
+    return projection
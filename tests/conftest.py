@@ -1,7 +1,8 @@
 # External Modules
-from typing import List
+from typing import Dict, List
 
 import pytest
+from bson.objectid import ObjectId
 from httpx import AsyncClient
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
@@ -9,7 +10,12 @@ from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from mini_blog_api.config import Settings, get_settings
 from mini_blog_api.main import MiniBlogAPI, create_app
 from mini_blog_api.repositories.auth_repository import AuthRepository
+from mini_blog_api.repositories.card_repository import CardRepository
+from mini_blog_api.repositories.category_repository import CategoryRepository
 from mini_blog_api.repositories.db import get_db
+from mini_blog_api.repositories.memory_engine import MemoryDatabase
+from mini_blog_api.repositories.stats_repository import CardStatsRepository
+from mini_blog_api.services.auth import generate_access_token
 
 
 def get_test_settings() -> Settings:
@@ -36,6 +42,44 @@ def test_mini_blog_db():
     db_client.close()
 
 
+def init_mock_db(db: MemoryDatabase) -> None:
+    AuthRepository.initialize(db=db)
+    CategoryRepository.initialize(db=db)
+    CardRepository.initialize(db=db)
+    CardStatsRepository.initialize(db=db)
+
+
+@pytest.fixture
+def mock_db():
+    """Repositories backed by a fresh in-memory engine database."""
+    db = MemoryDatabase("test_mini_blog_db")
+    init_mock_db(db)
+
+    yield db
+
+
+@pytest.fixture
+async def mock_client(mock_db):
+    """Application client whose repositories use the in-memory database."""
+    app: MiniBlogAPI = create_app()
+    app.dependency_overrides[get_settings] = get_test_settings
+    init_mock_db(mock_db)
+
+    async with AsyncClient(app=app, base_url="http://test") as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def test_user_id() -> ObjectId:
+    return ObjectId("64c8b2f5e4b0a1a2b3c4d5e6")
+
+
+@pytest.fixture
+def auth_headers(test_user_id) -> Dict[str, str]:
+    token = generate_access_token(account=dict(sub=str(test_user_id)))
+    return {"Authorization": f"Bearer {token}"}
+
+
 @pytest.fixture
 async def client():
     app: MiniBlogAPI = create_app()
@@ -1,5 +1,10 @@
+from datetime import datetime
+
 import pytest
 
+from mini_blog_api.config import get_settings
+from mini_blog_api.repositories.auth_repository import AuthRepository
+
 from .dummy_data import user_payload
 
 
@@ -34,3 +39,40 @@ async def test_login_success(client, test_mini_blog_db):
         assert response.json()["token_type"] == "bearer"
     elif response.status_code == 401:
         assert response.json() == {"detail": "Invalid credentials"}
+
+
+@pytest.fixture
+def fast_bcrypt(monkeypatch):
+    monkeypatch.setattr(get_settings(), "bcrypt_rounds", 4)
+
+
+@pytest.mark.asyncio
+async def test_register_and_login_with_hashed_password(mock_client, fast_bcrypt):
+    response = await mock_client.post("/api/v1/auth/register", json=user_payload)
+    assert response.status_code == 200
+    password = response.json()["password"]
+
+    response = await mock_client.post(
+        "/api/v1/auth/login", data={"username": "testuser", "password": password}
+    )
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+    response = await mock_client.post(
+        "/api/v1/auth/login", data={"username": "testuser", "password": "wrong"}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_stored_hash_is_not_a_password(mock_client, mock_db, fast_bcrypt):
+    response = await mock_client.post("/api/v1/auth/register", json=user_payload)
+    assert response.status_code == 200
+    stored = await mock_db["user_auth"].find_one({"username": "testuser"})
+    assert stored["password_version"] == AuthRepository.password_version
+
+    response = await mock_client.post(
+        "/api/v1/auth/login",
+        data={"username": "testuser", "password": stored["password"]},
+    )
+    assert response.status_code == 401
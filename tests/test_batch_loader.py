@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson.objectid import ObjectId
+
+from mini_blog_api.repositories.category_repository import CategoryRepository
+from mini_blog_api.services.batch_loader import BatchLoader
+
+
+def recording_loader(**kwargs):
+    calls = []
+
+    async def load_many(keys):
+        calls.append(sorted(keys))
+        await asyncio.sleep(0)
+        return {key: key * 10 for key in keys if key != 0}
+
+    return BatchLoader(load_many, **kwargs), calls
+
+
+@pytest.mark.asyncio
+async def test_lookups_in_one_tick_share_one_query():
+    loader, calls = recording_loader()
+
+    results = await asyncio.gather(*(loader.load(key) for key in [3, 1, 2, 1, 0]))
+    assert results == [30, 10, 20, 10, None]
+    assert calls == [[0, 1, 2, 3]]
+    assert loader.stats() == dict(batches=1, loads=5)
+
+
+@pytest.mark.asyncio
+async def test_batches_are_bounded_and_windowed():
+    loader, calls = recording_loader(max_batch_size=2)
+    await asyncio.gather(*(loader.load(key) for key in [1, 2, 3]))
+    assert calls == [[1, 2], [3]]
+
+    loader, calls = recording_loader(window=0.05)
+
+    async def late_load(key):
+        await asyncio.sleep(0.01)
+        return await loader.load(key)
+
+    assert await asyncio.gather(loader.load(1), late_load(2)) == [10, 20]
+    assert calls == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_lookup():
+    async def load_many(keys):
+        raise RuntimeError("down")
+
+    loader = BatchLoader(load_many)
+    results = await asyncio.gather(
+        loader.load(1), loader.load(2), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+
+@pytest.mark.asyncio
+async def test_category_lookups_by_id_are_batched(mock_db):
+    ids = [ObjectId(), ObjectId(), ObjectId()]
+    await mock_db["category"].insert_many(
+        [
+            dict(
+                _id=_id,
+                name=f"c{i}",
+                description=None,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            )
+            for i, _id in enumerate(ids)
+        ]
+    )
+    batches = CategoryRepository.loader.batches
+
+    docs = await asyncio.gather(
+        *(CategoryRepository.find_one(_id=_id) for _id in ids + [ObjectId()])
+    )
+    assert [doc and doc.name for doc in docs] == ["c0", "c1", "c2", None]
+    assert CategoryRepository.loader.batches - batches == 1
@@ -0,0 +1,481 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from mini_blog_api.repositories.card_repository import CardRepository
+
+from .dummy_data import card_payload, category_payload
+
+
+async def seed_cards(mock_db, author: ObjectId, count: int):
+    docs = [
+        dict(
+            card_payload,
+            name=f"{card_payload['name']}{i}",
+            category=ObjectId(card_payload["category"]),
+            author=author,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+        for i in range(count)
+    ]
+    await mock_db["cards"].insert_many(docs)
+    return docs
+
+
+async def seed_category(mock_db):
+    await mock_db["category"].insert_one(
+        dict(
+            category_payload,
+            _id=ObjectId(card_payload["category"]),
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_card_list_cursor_pagination(
+    mock_client, mock_db, auth_headers, test_user_id
+):
+    await seed_cards(mock_db, test_user_id, 5)
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = await mock_client.get(
+            "/api/v1/cards", params=params, headers=auth_headers
+        )
+        assert response.status_code == 200
+        body = response.json()
+        seen.extend(card["_id"] for card in body["cards"])
+        if body["next_cursor"] is None:
+            break
+        params = {"limit": 2, "cursor": body["next_cursor"]}
+
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+
+@pytest.mark.asyncio
+async def test_card_list_rejects_bad_pagination(mock_client, auth_headers):
+    response = await mock_client.get(
+        "/api/v1/cards", params={"cursor": "not-a-cursor"}, headers=auth_headers
+    )
+    assert response.status_code == 400
+
+    response = await mock_client.get(
+        "/api/v1/cards", params={"skip": 1000000}, headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "path,params",
+    [
+        ("/api/v1/cards", {"id": "not-an-id"}),
+        ("/api/v1/cards/export", {"category": "not-an-id"}),
+        ("/api/v1/cards/search", {"q": "dragons", "category": "not-an-id"}),
+    ],
+)
+async def test_card_queries_reject_invalid_ids(mock_client, auth_headers, path, params):
+    response = await mock_client.get(path, params=params, headers=auth_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_card_update_and_delete_are_owner_scoped(
+    mock_client, mock_db, auth_headers, test_user_id
+):
+    (own_card, other_card) = await seed_cards(mock_db, test_user_id, 2)
+    await mock_db["cards"].update_one(
+        {"_id": other_card["_id"]}, {"$set": {"author": ObjectId()}}
+    )
+
+    response = await mock_client.patch(
+        f"/api/v1/cards/{own_card['_id']}",
+        json={"status": "published", "author": str(ObjectId())},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    updated = await mock_db["cards"].find_one({"_id": own_card["_id"]})
+    assert updated["status"] == "published"
+    assert updated["author"] == test_user_id
+
+    response = await mock_client.patch(
+        f"/api/v1/cards/{other_card['_id']}",
+        json={"status": "published"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 403
+
+    response = await mock_client.delete(
+        f"/api/v1/cards/{other_card['_id']}", headers=auth_headers
+    )
+    assert response.status_code == 403
+
+    response = await mock_client.delete(
+        f"/api/v1/cards/{own_card['_id']}", headers=auth_headers
+    )
+    assert response.status_code == 204
+    assert await mock_db["cards"].find_one({"_id": own_card["_id"]}) is None
+
+    response = await mock_client.delete(
+        f"/api/v1/cards/{own_card['_id']}", headers=auth_headers
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_create_card(mock_client, mock_db, auth_headers):
+    response = await mock_client.post(
+        "/api/v1/cards", json=card_payload, headers=auth_headers
+    )
+    assert response.status_code == 404
+
+    await seed_category(mock_db)
+    response = await mock_client.post(
+        "/api/v1/cards", json=card_payload, headers=auth_headers
+    )
+    assert response.status_code == 201
+
+    response = await mock_client.post(
+        "/api/v1/cards", json=card_payload, headers=auth_headers
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_export_cards_as_ndjson(mock_client, mock_db, auth_headers, test_user_id):
+    await seed_cards(mock_db, test_user_id, 3)
+
+    response = await mock_client.get(
+        "/api/v1/cards/export", params={"status": "draft"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [card["name"] for card in lines] == ["TestCard0", "TestCard1", "TestCard2"]
+    assert lines[0]["author"] == str(test_user_id)
+
+
+@pytest.mark.asyncio
+async def test_search_cards(mock_client, mock_db, auth_headers, test_user_id):
+    docs = await seed_cards(mock_db, test_user_id, 3)
+    await mock_db["cards"].update_one(
+        {"_id": docs[1]["_id"]}, {"$set": {"content": "dragons and more dragons"}}
+    )
+    await mock_db["cards"].update_one(
+        {"_id": docs[2]["_id"]}, {"$set": {"content": "a dragon"}}
+    )
+
+    response = await mock_client.get(
+        "/api/v1/cards/search", params={"q": "dragons"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert [card["name"] for card in response.json()["cards"]] == ["TestCard1"]
+
+    params = {"q": "content dragons", "limit": 1}
+    pages = []
+    while True:
+        response = await mock_client.get(
+            "/api/v1/cards/search", params=params, headers=auth_headers
+        )
+        if response.status_code == 404:
+            break
+        body = response.json()
+        pages.extend(card["name"] for card in body["cards"])
+        params["cursor"] = body["next_cursor"]
+    assert pages == ["TestCard1", "TestCard0"]
+
+    response = await mock_client.get(
+        "/api/v1/cards/search", params={"q": "nothing"}, headers=auth_headers
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_search_failures_do_not_fall_back(
+    mock_client, mock_db, auth_headers, test_user_id, monkeypatch
+):
+    await seed_cards(mock_db, test_user_id, 1)
+
+    def timeout(pipeline, **kwargs):
+        raise OperationFailure("operation exceeded time limit", 50)
+
+    monkeypatch.setattr(CardRepository.collection, "aggregate", timeout)
+
+    response = await mock_client.get(
+        "/api/v1/cards/search", params={"q": "content"}, headers=auth_headers
+    )
+    assert response.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_card_sparse_fieldsets(mock_client, mock_db, auth_headers, test_user_id):
+    (card,) = await seed_cards(mock_db, test_user_id, 1)
+
+    response = await mock_client.get(
+        "/api/v1/cards", params={"fields": "id,name,status"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["cards"] == [
+        {"_id": str(card["_id"]), "name": "TestCard0", "status": "draft"}
+    ]
+
+    response = await mock_client.get(
+        f"/api/v1/cards/{card['_id']}",
+        params={"fields": "name,updated_at"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert set(response.json()) == {"_id", "name", "updated_at"}
+
+    response = await mock_client.get(
+        f"/api/v1/cards/{card['_id']}", headers=auth_headers
+    )
+    assert "content" in response.json()
+
+    response = await mock_client.get(
+        "/api/v1/cards", params={"fields": "password"}, headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_bulk_card_operations(mock_client, mock_db, auth_headers, test_user_id):
+    await seed_category(mock_db)
+    await mock_db["cards"].create_index("name", unique=True)
+
+    cards = [
+        dict(card_payload, name="Bulk0"),
+        dict(card_payload, name="Bulk0"),
+        dict(card_payload, name="Bulk1", category=str(ObjectId())),
+        dict(card_payload, name="Bulk2", category="invalid"),
+        dict(card_payload, name="Bulk3"),
+    ]
+    response = await mock_client.post(
+        "/api/v1/cards:bulk", json={"cards": cards}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status_code"] for r in body["results"]] == [201, 403, 404, 400, 201]
+    assert (body["succeeded"], body["failed"]) == (2, 3)
+    created = [body["results"][0]["card_id"], body["results"][4]["card_id"]]
+
+    (foreign,) = await seed_cards(mock_db, ObjectId(), 1)
+    changes = [
+        {"id": created[0], "status": "published"},
+        {"id": str(foreign["_id"]), "status": "published"},
+        {"id": str(ObjectId()), "status": "published"},
+    ]
+    response = await mock_client.patch(
+        "/api/v1/cards:bulk", json={"cards": changes}, headers=auth_headers
+    )
+    assert [r["status_code"] for r in response.json()["results"]] == [200, 403, 404]
+    card = await mock_db["cards"].find_one({"_id": ObjectId(created[0])})
+    assert card["status"] == "published"
+
+    response = await mock_client.post(
+        "/api/v1/cards:bulkDelete",
+        json={"ids": created + [str(foreign["_id"])]},
+        headers=auth_headers,
+    )
+    assert [r["status_code"] for r in response.json()["results"]] == [200, 200, 403]
+    assert await mock_db["cards"].count_documents({}) == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_status_reports_write_errors(
+    mock_client, mock_db, auth_headers, test_user_id, monkeypatch
+):
+    docs = await seed_cards(mock_db, test_user_id, 2)
+    collection = CardRepository.collection
+    bulk_write = collection.bulk_write
+
+    async def reject_first(requests, ordered=True):
+        await bulk_write(requests[1:], ordered=ordered)
+        raise BulkWriteError(
+            {
+                "writeErrors": [
+                    {"index": 0, "code": 121, "errmsg": "Document failed validation"}
+                ],
+                "nModified": len(requests) - 1,
+            }
+        )
+
+    monkeypatch.setattr(collection, "bulk_write", reject_first)
+
+    changes = [
+        {"id": "invalid", "status": "published"},
+        {"id": str(docs[0]["_id"]), "status": "published"},
+        {"id": str(docs[1]["_id"]), "status": "published"},
+    ]
+    response = await mock_client.patch(
+        "/api/v1/cards:bulk", json={"cards": changes}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status_code"] for r in results] == [400, 500, 200]
+    assert results[1]["detail"] == "Document failed validation"
+    card = await mock_db["cards"].find_one({"_id": docs[1]["_id"]})
+    assert card["status"] == "published"
+
+
+@pytest.mark.asyncio
+async def test_card_stats_counters(mock_client, mock_db, auth_headers, test_user_id):
+    await seed_category(mock_db)
+    category_stats = f"/api/v1/categories/{card_payload['category']}/stats"
+
+    response = await mock_client.post(
+        "/api/v1/cards:bulk",
+        json={"cards": [dict(card_payload, name=f"Card{i}") for i in range(3)]},
+        headers=auth_headers,
+    )
+    card_ids = [result["card_id"] for result in response.json()["results"]]
+    await mock_client.patch(
+        f"/api/v1/cards/{card_ids[0]}",
+        json={"status": "published"},
+        headers=auth_headers,
+    )
+    await mock_client.delete(f"/api/v1/cards/{card_ids[1]}", headers=auth_headers)
+
+    response = await mock_client.get("/api/v1/cards/stats", headers=auth_headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["total"] == 2
+    assert stats["statuses"]["draft"] == 1
+    assert stats["statuses"]["published"] == 1
+    response = await mock_client.get(category_stats, headers=auth_headers)
+    assert response.json() == stats
+
+    # writes bypassing the repository are picked up by the reconciliation
+    await seed_cards(mock_db, test_user_id, 2)
+    response = await mock_client.post("/internal/stats/reconcile", headers=auth_headers)
+    assert response.json() == {"counters": 2}
+    response = await mock_client.get(category_stats, headers=auth_headers)
+    assert response.json()["total"] == 4
+    assert response.json()["statuses"]["draft"] == 3
+
+    response = await mock_client.get(
+        "/api/v1/categories/64c8b2f5e4b0a1a2b3c4d5e6/stats", headers=auth_headers
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_author_feed(mock_client, mock_db, auth_headers, test_user_id):
+    docs = await seed_cards(mock_db, test_user_id, 5)
+    await seed_cards(mock_db, ObjectId(), 2)
+    newest_first = [doc["name"] for doc in reversed(docs)]
+
+    names, params = [], {"limit": 2}
+    while True:
+        response = await mock_client.get(
+            "/api/v1/me/cards", params=params, headers=auth_headers
+        )
+        assert response.status_code == 200
+        body = response.json()
+        names.extend(card["name"] for card in body["cards"])
+        if not body["next_cursor"]:
+            break
+        params["cursor"] = body["next_cursor"]
+    assert names == newest_first
+
+    response = await mock_client.get(
+        f"/api/v1/users/{test_user_id}/cards",
+        params={"fields": "name"},
+        headers=auth_headers,
+    )
+    assert [card["name"] for card in response.json()["cards"]] == newest_first
+    assert "content" not in response.json()["cards"][0]
+
+    response = await mock_client.get(
+        f"/api/v1/users/{ObjectId()}/cards", headers=auth_headers
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_card_conditional_get(mock_client, mock_db, auth_headers, test_user_id):
+    docs = await seed_cards(mock_db, test_user_id, 2)
+    url = f"/api/v1/cards/{docs[0]['_id']}"
+
+    response = await mock_client.get(url, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, no-cache"
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+
+    response = await mock_client.get(
+        url, headers=dict(auth_headers, **{"If-None-Match": etag})
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = await mock_client.get(
+        url, headers=dict(auth_headers, **{"If-Modified-Since": last_modified})
+    )
+    assert response.status_code == 304
+
+    response = await mock_client.get(
+        url,
+        params={"fields": "name"},
+        headers=dict(auth_headers, **{"If-None-Match": etag}),
+    )
+    assert response.status_code == 200
+
+    await mock_client.patch(url, json={"content": "changed"}, headers=auth_headers)
+    response = await mock_client.get(
+        url, headers=dict(auth_headers, **{"If-None-Match": etag})
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == "changed"
+
+    response = await mock_client.get("/api/v1/cards", headers=auth_headers)
+    list_etag = response.headers["etag"]
+    response = await mock_client.get(
+        "/api/v1/cards", headers=dict(auth_headers, **{"If-None-Match": list_etag})
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_card_list_response_cache(
+    mock_client, mock_db, auth_headers, test_user_id, monkeypatch
+):
+    await seed_cards(mock_db, test_user_id, 30)
+    response = await mock_client.get(
+        "/api/v1/cards", params={"limit": 20, "name": ""}, headers=auth_headers
+    )
+    assert response.headers["x-cache"] == "MISS"
+    body = response.json()
+
+    async def find_raw(*args, **kwargs):
+        raise AssertionError("cache hit must not query the repository")
+
+    monkeypatch.setattr(CardRepository, "find_raw", find_raw)
+    response = await mock_client.get(
+        "/api/v1/cards",
+        params={"limit": 20},
+        headers=dict(auth_headers, **{"Accept-Encoding": "gzip"}),
+    )
+    assert response.headers["x-cache"] == "HIT"
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == body
+    monkeypatch.undo()
+
+    await mock_client.delete(
+        f"/api/v1/cards/{body['cards'][0]['_id']}", headers=auth_headers
+    )
+    response = await mock_client.get(
+        "/api/v1/cards", params={"limit": 20}, headers=auth_headers
+    )
+    assert response.headers["x-cache"] == "MISS"
+    assert len(response.json()["cards"]) == 20
+    assert response.json()["cards"][0] != body["cards"][0]
@@ -0,0 +1,63 @@
+import pytest
+
+from mini_blog_api.repositories.category_repository import CategoryRepository
+
+from .dummy_data import category_payload
+
+
+@pytest.mark.asyncio
+async def test_category_reads_are_cached_until_write(mock_client, auth_headers):
+    response = await mock_client.post(
+        "/api/v1/categories", json=category_payload, headers=auth_headers
+    )
+    assert response.status_code == 201
+
+    response = await mock_client.get("/api/v1/categories", headers=auth_headers)
+    category_id = response.json()["category"][0]["_id"]
+
+    for _ in range(3):
+        response = await mock_client.get(
+            f"/api/v1/categories/{category_id}", headers=auth_headers
+        )
+        assert response.status_code == 200
+
+    stats = (await mock_client.get("/internal/cache", headers=auth_headers)).json()
+    assert stats["category"]["misses"] == 3  # name check, first list, first get
+    assert stats["category"]["hits"] == 2
+
+    response = await mock_client.get(
+        "/api/v1/categories", params={"skip": 0}, headers=auth_headers
+    )
+    assert response.headers["x-cache"] == "MISS"
+    response = await mock_client.get("/api/v1/categories", headers=auth_headers)
+    assert response.headers["x-cache"] == "HIT"
+
+    response = await mock_client.post(
+        "/api/v1/categories",
+        json=dict(category_payload, name="poetry"),
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert len(CategoryRepository.cache) == 0
+
+    response = await mock_client.get("/api/v1/categories", headers=auth_headers)
+    assert response.headers["x-cache"] == "MISS"
+    assert len(response.json()["category"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_category_conditional_get(mock_client, auth_headers):
+    await mock_client.post(
+        "/api/v1/categories", json=category_payload, headers=auth_headers
+    )
+    response = await mock_client.get("/api/v1/categories", headers=auth_headers)
+    category_id = response.json()["category"][0]["_id"]
+
+    for url in ("/api/v1/categories", f"/api/v1/categories/{category_id}"):
+        response = await mock_client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        response = await mock_client.get(
+            url,
+            headers=dict(auth_headers, **{"If-None-Match": response.headers["etag"]}),
+        )
+        assert response.status_code == 304
@@ -0,0 +1,81 @@
+import pytest
+from httpx import AsyncClient
+
+from mini_blog_api.config import Settings, get_settings
+from mini_blog_api.main import create_app
+from mini_blog_api.metrics import http_metrics
+from mini_blog_api.repositories.indexes import ensure_indexes
+
+
+@pytest.mark.asyncio
+async def test_index_drift_report(mock_client, auth_headers):
+    response = await mock_client.get("/internal/indexes", headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["in_sync"] is False
+    cards = next(c for c in body["collections"] if c["collection"] == "cards")
+    assert cards["missing"] == [
+        "author_created_at",
+        "name_content_text",
+        "name_unique",
+    ]
+
+    await ensure_indexes()
+
+    response = await mock_client.get("/internal/indexes", headers=auth_headers)
+    assert response.json()["in_sync"] is True
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(mock_client, auth_headers):
+    http_metrics.reset()
+    await mock_client.get(
+        "/api/v1/cards/64c8b2f5e4b0a1a2b3c4d5e6", headers=auth_headers
+    )
+    await mock_client.get("/api/v1/cards/64c8b2f5e4b0a1a2b3c4d5e6")
+
+    # scraped the way Prometheus does, without a JWT
+    response = await mock_client.get("/internal/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    route = 'route="/api/v1/cards/{card_id}"'
+    assert (
+        f'http_requests_total{{method="GET",{route},status="404"}} 1' in response.text
+    )
+    assert (
+        f'http_requests_total{{method="GET",{route},status="403"}} 1' in response.text
+    )
+    assert (
+        f'http_request_duration_seconds_bucket{{method="GET",{route},status="404",le="+Inf"}} 1'
+        in response.text
+    )
+
+
+@pytest.mark.asyncio
+async def test_metrics_scrape_token(mock_db):
+    def scrape_settings() -> Settings:
+        return Settings(metrics_token="scrape-secret")
+
+    app = create_app()
+    app.dependency_overrides[get_settings] = scrape_settings
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        assert (await client.get("/internal/metrics")).status_code == 403
+        response = await client.get(
+            "/internal/metrics", headers={"Authorization": "Bearer wrong"}
+        )
+        assert response.status_code == 403
+        response = await client.get(
+            "/internal/metrics", headers={"Authorization": "Bearer scrape-secret"}
+        )
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_app_info_and_healthcheck(mock_client, auth_headers):
+    response = await mock_client.get("/internal/app_info", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["app_name"] == "mini_blog_api"
+
+    response = await mock_client.get("/internal/healthcheck", headers=auth_headers)
+    assert (response.status_code, response.text) == (200, "T0sK")
@@ -0,0 +1,232 @@
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from mini_blog_api.repositories import memory_engine
+from mini_blog_api.repositories.memory_engine import MemoryDatabase
+
+
+@pytest.fixture
+def cards():
+    return MemoryDatabase("test")["cards"]
+
+
+@pytest.mark.asyncio
+async def test_queries_projections_and_round_trips(cards):
+    created_at = datetime(2024, 1, 2, 3, 4, 5, 678999, tzinfo=timezone.utc)
+    await cards.insert_many(
+        [
+            dict(_id=i, name=f"card{i}", status=["draft", "published"][i % 2])
+            for i in range(10)
+        ]
+        + [dict(_id=10, name="dated", meta={"views": 3}, created_at=created_at)]
+    )
+
+    docs = await cards.find(
+        {"$or": [{"status": "published"}, {"meta.views": {"$gte": 3}}]},
+        {"name": 1, "_id": 0},
+        skip=1,
+        limit=3,
+        sort=[("_id", DESCENDING)],
+    ).to_list(length=None)
+    assert docs == [{"name": "card9"}, {"name": "card7"}, {"name": "card5"}]
+
+    assert await cards.count_documents({"_id": {"$in": [1, 2, 42]}}) == 2
+    assert await cards.count_documents({"status": {"$nin": ["draft"]}}) == 6
+    assert await cards.count_documents({"status": None}) == 1
+    # values of different types do not compare
+    assert await cards.count_documents({"name": {"$gt": 0}}) == 0
+    with pytest.raises(OperationFailure):
+        await cards.count_documents({"name": {"$regex": "card"}})
+
+    # stored like MongoDB: naive UTC with millisecond precision, copies on read
+    dated = await cards.find_one({"created_at": created_at}, {"meta": 1})
+    assert dated == {"_id": 10, "meta": {"views": 3}}
+    dated["meta"]["views"] = 0
+    stored = await cards.find_one({"_id": 10})
+    assert stored["meta"]["views"] == 3
+    assert stored["created_at"] == datetime(2024, 1, 2, 3, 4, 5, 678000)
+
+
+@pytest.mark.asyncio
+async def test_updates_and_upserts(cards):
+    _id = (await cards.insert_one({"name": "card", "likes": 1})).inserted_id
+
+    result = await cards.update_one(
+        {"_id": _id}, {"$set": {"stats.views": 1}, "$inc": {"likes": 2}}
+    )
+    assert (result.matched_count, result.modified_count) == (1, 1)
+    result = await cards.update_one({"_id": _id}, {"$set": {"likes": 3}})
+    assert (result.matched_count, result.modified_count) == (1, 0)
+
+    before = await cards.find_one_and_update(
+        {"_id": _id}, {"$set": {"name": "renamed"}}, {"name": 1}
+    )
+    assert before == {"_id": _id, "name": "card"}
+    assert await cards.find_one({"_id": _id}, {"_id": 0, "name": 1}) == {
+        "name": "renamed"
+    }
+
+    await cards.bulk_write(
+        [
+            UpdateOne({"_id": "all"}, {"$inc": {"statuses.draft": 1}}, upsert=True),
+            UpdateOne({"_id": "all"}, {"$inc": {"statuses.draft": 1}}, upsert=True),
+            ReplaceOne({"_id": "other"}, {"total": 5}, upsert=True),
+        ],
+        ordered=False,
+    )
+    assert await cards.find_one({"_id": "all"}) == {
+        "_id": "all",
+        "statuses": {"draft": 2},
+    }
+    assert await cards.find_one({"_id": "other"}) == {"_id": "other", "total": 5}
+
+    with pytest.raises(OperationFailure):
+        await cards.update_one({"_id": _id}, {"$set": {"_id": "other"}})
+    deleted = await cards.find_one_and_delete({"_id": _id}, {"likes": 1})
+    assert deleted == {"_id": _id, "likes": 3}
+    result = await cards.delete_many({"_id": {"$nin": ["all"]}})
+    assert result.deleted_count == 1
+
+
+@pytest.mark.asyncio
+async def test_unique_indexes_reject_duplicates(cards):
+    await cards.create_indexes(
+        [IndexModel([("name", ASCENDING)], name="name_unique", unique=True)]
+    )
+    await cards.insert_one({"_id": 1, "name": "first"})
+
+    with pytest.raises(DuplicateKeyError):
+        await cards.insert_one({"_id": 2, "name": "first"})
+    with pytest.raises(DuplicateKeyError):
+        await cards.insert_one({"_id": 1, "name": "other"})
+
+    with pytest.raises(BulkWriteError) as error:
+        await cards.insert_many(
+            [{"_id": 3, "name": "first"}, {"_id": 4, "name": "fourth"}], ordered=False
+        )
+    assert error.value.details["nInserted"] == 1
+    assert [e["index"] for e in error.value.details["writeErrors"]] == [0]
+
+    # the hash index follows updates
+    await cards.update_one({"_id": 4}, {"$set": {"name": "renamed"}})
+    await cards.insert_one({"_id": 5, "name": "fourth"})
+    assert await cards.find_one({"name": "renamed"}) == {"_id": 4, "name": "renamed"}
+
+    info = await cards.index_information()
+    assert info["name_unique"]["unique"] is True
+    assert sorted(info) == ["_id_", "name_unique"]
+
+
+@pytest.mark.asyncio
+async def test_sorted_index_scans_stop_at_the_limit(cards):
+    await cards.create_index(
+        [("author", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="author_created_at",
+    )
+    docs = [
+        dict(_id=i, author=i % 3, created_at=datetime(2024, 1, 1 + i % 5))
+        for i in range(60)
+    ]
+    await cards.insert_many(docs)
+
+    expected = sorted(
+        (doc for doc in docs if doc["author"] == 1),
+        key=lambda doc: (doc["created_at"], doc["_id"]),
+        reverse=True,
+    )
+    sort = [("created_at", DESCENDING), ("_id", DESCENDING)]
+    found = await cards.find({"author": 1}, limit=5, sort=sort).to_list(length=None)
+    assert found == expected[:5]
+
+    # keyset continuation after the last document of the page
+    last = found[-1]
+    query = {
+        "author": 1,
+        "$or": [
+            {"created_at": {"$lt": last["created_at"]}},
+            {"created_at": last["created_at"], "_id": {"$lt": last["_id"]}},
+        ],
+    }
+    page = await cards.find(query, sort=sort).to_list(length=None)
+    assert page == expected[5:]
+
+    # natural order follows insertion, also for updated documents
+    await cards.update_one({"_id": 56}, {"$set": {"author": 2}})
+    ids = [doc["_id"] async for doc in cards.find({"_id": {"$gt": 55}}, {"_id": 1})]
+    assert ids == [56, 57, 58, 59]
+    cursor = cards.find({"_id": {"$gte": 3, "$lt": 6}}, sort=[("_id", DESCENDING)])
+    assert [doc["_id"] for doc in await cursor.to_list(length=None)] == [5, 4, 3]
+
+
+@pytest.mark.asyncio
+async def test_id_keyset_pages_read_about_limit_documents(cards, monkeypatch):
+    ids = list(range(2000))
+    ids.sort(key=lambda i: (i * 7919) % 2000)  # not inserted in _id order
+    await cards.insert_many([dict(_id=i, category=i % 2) for i in ids])
+
+    read = set()
+
+    def counted(doc, query):
+        read.add(doc["_id"])
+        return matches(doc, query)
+
+    matches = memory_engine.matches
+    monkeypatch.setattr(memory_engine, "matches", counted)
+
+    query = {"$and": [{"category": 1}, {"_id": {"$gt": 1500}}]}
+    sort = [("_id", ASCENDING)]
+    page = await cards.find(query, limit=10, sort=sort).to_list(length=None)
+    assert [doc["_id"] for doc in page] == list(range(1501, 1521, 2))
+    assert len(read) == 19  # 1501 to 1519
+
+    read.clear()
+    sort = [("_id", DESCENDING)]
+    page = await cards.find({"_id": {"$lt": 500}}, limit=10, sort=sort).to_list(None)
+    assert [doc["_id"] for doc in page] == list(range(499, 489, -1))
+    assert len(read) == 10
+
+    # the sorted _id index follows deletes
+    await cards.delete_many({"_id": {"$in": [1501, 1503]}})
+    page = await cards.find(query, limit=2, sort=[("_id", ASCENDING)]).to_list(None)
+    assert [doc["_id"] for doc in page] == [1505, 1507]
+
+
+@pytest.mark.asyncio
+async def test_aggregation_and_text_search(cards):
+    await cards.insert_many(
+        [
+            dict(_id=1, name="python tips", content="python python", status="draft"),
+            dict(_id=2, name="mongo", content="indexes for python", status="draft"),
+            dict(_id=3, name="rust", content="borrow checker", status="published"),
+        ]
+    )
+    pipeline = [
+        {"$match": {"$text": {"$search": "python"}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$limit": 5},
+    ]
+    with pytest.raises(OperationFailure) as error:
+        await cards.aggregate(pipeline).to_list(length=None)
+    assert error.value.code == 27
+
+    await cards.create_indexes(
+        [IndexModel([("name", TEXT), ("content", TEXT)], name="name_content_text")]
+    )
+    found = await cards.aggregate(pipeline).to_list(length=None)
+    assert [doc["_id"] for doc in found] == [1, 2]
+    assert found[0]["score"] > found[1]["score"]
+
+    groups = await cards.aggregate(
+        [
+            {"$group": {"_id": {"status": "$status"}, "total": {"$sum": 1}}},
+            {"$sort": {"_id.status": 1}},
+        ]
+    ).to_list(length=None)
+    assert groups == [
+        {"_id": {"status": "draft"}, "total": 2},
+        {"_id": {"status": "published"}, "total": 1},
+    ]
@@ -0,0 +1,53 @@
+import pytest
+from fastapi import FastAPI, Request
+from httpx import AsyncClient
+
+from mini_blog_api.middleware import Authorization
+from mini_blog_api.services.auth import generate_access_token
+
+
+@pytest.fixture
+async def auth_client():
+    app = FastAPI()
+
+    @app.get("/whoami")
+    async def whoami(request: Request):
+        return {"user": request.state.user}
+
+    app.add_middleware(Authorization)
+
+    async with AsyncClient(app=app, base_url="http://test") as test_client:
+        yield test_client
+
+
+@pytest.mark.asyncio
+async def test_missing_token_is_rejected(auth_client):
+    response = await auth_client.get("/whoami")
+    assert response.status_code == 403
+    assert response.json() == {"reason": "Authorization token is missing"}
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_is_rejected(auth_client):
+    response = await auth_client.get(
+        "/whoami", headers={"Authorization": "Bearer mocktoken"}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_verified_token_is_cached(auth_client, monkeypatch):
+    token = generate_access_token(account=dict(sub="64c8b2f5e4b0a1a2b3c4d5e6"))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await auth_client.get("/whoami", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"user": "64c8b2f5e4b0a1a2b3c4d5e6"}
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("cached token must not be decoded again")
+
+    monkeypatch.setattr("mini_blog_api.middleware.jwt.decode", fail_decode)
+    response = await auth_client.get("/whoami", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"user": "64c8b2f5e4b0a1a2b3c4d5e6"}
@@ -0,0 +1,45 @@
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+import bcrypt
+import mongomock
+
+from mini_blog_api.repositories.auth_repository import AuthRepository
+
+script = Path(__file__).parents[1] / "scripts" / "db" / "migrate-passwords.py"
+spec = importlib.util.spec_from_file_location("migrate_passwords", script)
+migrate_passwords = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(migrate_passwords)
+
+
+def test_legacy_accounts_are_rehashed_once():
+    collection = mongomock.MongoClient()["test"]["user_auth"]
+    legacy_password = bcrypt.hashpw(b"random", bcrypt.gensalt(rounds=4)).decode()
+    current = dict(
+        username="current",
+        password="$2b$04$alreadyahashofageneratedpassword",
+        password_version=AuthRepository.password_version,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+    collection.insert_many(
+        [
+            dict(
+                username="legacy",
+                password=legacy_password,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            ),
+            current,
+        ]
+    )
+
+    assert migrate_passwords.migrate(collection, rounds=4) == 1
+    assert migrate_passwords.migrate(collection, rounds=4) == 0
+
+    legacy = collection.find_one({"username": "legacy"})
+    assert legacy["password_version"] == AuthRepository.password_version
+    assert bcrypt.checkpw(legacy_password.encode(), legacy["password"].encode())
+    stored = collection.find_one({"username": "current"})
+    assert stored["password"] == current["password"]
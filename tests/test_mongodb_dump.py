@@ -0,0 +1,334 @@
+import gzip
+import importlib.util
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import bson
+import mongomock
+import pytest
+import pytz
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+script = Path(__file__).parents[1] / "scripts" / "db" / "mongodb-dump.py"
+spec = importlib.util.spec_from_file_location("mongodb_dump", script)
+mongodb_dump = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mongodb_dump)
+
+CUTOFF = datetime(2024, 1, 10, tzinfo=pytz.utc)
+NOW = datetime(2024, 1, 11, 12, tzinfo=pytz.utc)
+
+
+class RawCursor:
+    def __init__(self, docs):
+        self.docs = iter(docs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __next__(self):
+        return next(self.docs)
+
+
+class RawCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, query_filter, sort, batch_size):
+        docs = self.collection.find(query_filter, sort=sort)
+        return RawCursor(RawBSONDocument(bson.encode(doc)) for doc in docs)
+
+
+class RawDatabase:
+    """mongomock database reading documents as raw BSON, which mongomock cannot."""
+
+    def __init__(self, db):
+        self.db = db
+        self.name = db.name
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+    def list_collections(self, filter):
+        return [dict(name=filter["name"], type="collection", options={})]
+
+    def get_collection(self, name, codec_options):
+        return RawCollection(self.db[name])
+
+
+def failure():
+    return mongodb_dump.ProcessResult(out=b"failed", err=None, returncode=1)
+
+
+def success():
+    return mongodb_dump.ProcessResult(out=b"done", err=None, returncode=0)
+
+
+def oid(day, hour):
+    return ObjectId.from_datetime(datetime(2024, 1, day, hour, tzinfo=pytz.utc))
+
+
+def exported(path):
+    with gzip.open(path) as f:
+        return [doc["_id"] for doc in bson.decode_file_iter(f)]
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().get_database("blog")
+    db.cards.insert_many(
+        [dict(_id=oid(day, hour), day=day) for day, hour in [(8, 1), (8, 2), (10, 3)]]
+        + [dict(_id=oid(11, hour), day=11) for hour in (1, 2)]
+    )
+    db.categories.insert_one(dict(_id=oid(8, 5), day=8))
+    return db
+
+
+def periods(backup_dir):
+    return list(mongodb_dump.generate_retention_tasks(CUTOFF, 1, backup_dir)) + list(
+        mongodb_dump.generate_archive_tasks(CUTOFF, 2, backup_dir)
+    )
+
+
+def back_up(db, manifest, backup_dir, fail=()):
+    pending = mongodb_dump.plan_backups(
+        db, manifest, periods(backup_dir), ["cards", "categories"], NOW, CUTOFF
+    )
+    tasks = [
+        task._replace(run=failure) if task.name in fail else task
+        for task in mongodb_dump.export_tasks(pending, RawDatabase(db), manifest, NOW)
+    ]
+    limiter = mongodb_dump.ConnectionLimiter(2)
+    mongodb_dump.run_tasks("backup", tasks, 2, limiter)
+    return pending
+
+
+def planned(pending):
+    return sorted((b.collection, b.period.backup_start.day, b.final) for b in pending)
+
+
+def test_run_task_retries_with_exponential_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(mongodb_dump.timer, "sleep", sleeps.append)
+    results = iter([failure(), failure(), success()])
+    recorded = []
+    task = mongodb_dump.Task(
+        "retried", lambda: next(results), 1, {}, lambda: recorded.append(True)
+    )
+    limiter = mongodb_dump.ConnectionLimiter(1)
+
+    r = mongodb_dump.run_task(task, limiter, retries=2, backoff=1.5)
+    assert (r.ok, r.attempts, sleeps, recorded) == (True, 3, [1.5, 3.0], [True])
+
+    def missing_command():
+        raise FileNotFoundError("mongodump")
+
+    sleeps.clear()
+    task = mongodb_dump.Task("missing", missing_command, 1, {})
+    r = mongodb_dump.run_task(task, limiter, retries=1, backoff=1.0)
+    assert (r.ok, r.attempts, r.result.returncode, sleeps) == (False, 2, 127, [1.0])
+    assert limiter.in_use == 0
+
+
+def test_run_tasks_stays_under_the_connection_cap():
+    limiter = mongodb_dump.ConnectionLimiter(3)
+    lock = threading.Lock()
+    in_use = []
+
+    def run():
+        with lock:
+            in_use.append(limiter.in_use)
+        time.sleep(0.01)
+        return success()
+
+    tasks = [
+        mongodb_dump.Task(f"task-{i}", run, connections, {})
+        for i, connections in enumerate([2, 1, 2, 5, 1, 1, 2, 1])
+    ]
+    results = mongodb_dump.run_tasks("restore", tasks, 8, limiter)
+
+    assert all(r.ok for r in results) and len(results) == len(tasks)
+    assert max(in_use) == 3 and limiter.in_use == 0
+
+
+def test_export_db_writes_one_file_per_day(db, tmp_path):
+    days = [p for p in periods(tmp_path) if p.backup_start.day != 9]
+
+    r = mongodb_dump.export_db(RawDatabase(db), "cards", days, batch_size=2)
+
+    assert r.returncode == 0, r.out
+    assert r.out == b"5 documents exported into 3 files"
+    output_dirs = {p.backup_start.day: p.output_dir / "blog" for p in days}
+    assert exported(output_dirs[8] / "cards.bson.gz") == [oid(8, 1), oid(8, 2)]
+    assert exported(output_dirs[10] / "cards.bson.gz") == [oid(10, 3)]
+    assert exported(output_dirs[11] / "cards.bson.gz") == [oid(11, 1), oid(11, 2)]
+    metadata = gzip.decompress(
+        (output_dirs[11] / "cards.metadata.json.gz").read_bytes()
+    )
+    assert json.loads(metadata)["collectionName"] == "cards"
+
+
+def test_manifest_skips_archive_days_once_their_collection_was_swapped(db, tmp_path):
+    manifest_path = tmp_path / mongodb_dump.MANIFEST_NAME
+    backup_dir = tmp_path / "run-1"
+    pending = back_up(db, mongodb_dump.BackupManifest(manifest_path), backup_dir)
+    assert planned(pending) == [
+        ("cards", 8, True),
+        ("cards", 10, False),
+        ("cards", 11, False),
+        ("categories", 8, True),
+    ]
+
+    # empty days are recorded without writing a file
+    manifest = mongodb_dump.BackupManifest(manifest_path)
+    empty = manifest.entries["blog.cards/20240109"]
+    assert (empty["count"], empty["path"], empty["complete"]) == (0, None, False)
+    assert not backup_dir.joinpath("archive-20240109").exists()
+    empty_file = backup_dir / "retention-20240110" / "blog" / "categories.bson.gz"
+    assert not empty_file.exists()
+
+    archive = manifest.entries["blog.cards/20240108"]
+    assert (archive["count"], archive["complete"]) == (2, False)
+
+    # the swap did not run, archive days are still in the live collection
+    pending = back_up(db, manifest, tmp_path / "run-2")
+    assert ("cards", 8, True) in planned(pending)
+
+    archive_days = [p for p in periods(backup_dir) if p.backup_end <= CUTOFF]
+    manifest.complete("blog", "cards", archive_days)
+    manifest = mongodb_dump.BackupManifest(manifest_path)
+    assert manifest.entries["blog.cards/20240109"]["complete"]
+
+    # retention days take updates, they are dumped again on every run
+    pending = back_up(db, manifest, tmp_path / "run-3")
+    assert planned(pending) == [
+        ("cards", 10, False),
+        ("cards", 11, False),
+        ("categories", 8, True),
+    ]
+
+    # so are archive days whose file changed
+    archive = manifest.entries["blog.cards/20240108"]
+    archive_file = manifest.path.parent / archive["path"]
+    archive_file.write_bytes(b"truncated")
+    pending = back_up(db, mongodb_dump.BackupManifest(manifest_path), backup_dir)
+    assert ("cards", 8, True) in planned(pending)
+
+
+def test_manifest_records_what_the_export_wrote(db, tmp_path):
+    manifest = mongodb_dump.BackupManifest(tmp_path / mongodb_dump.MANIFEST_NAME)
+    pending = mongodb_dump.plan_backups(
+        db, manifest, periods(tmp_path), ["cards"], NOW, CUTOFF
+    )
+    # writes between the planning and the export
+    db.cards.delete_one({"_id": oid(11, 2)})
+    db.cards.insert_one(dict(_id=oid(10, 7), day=10))
+    tasks = list(mongodb_dump.export_tasks(pending, RawDatabase(db), manifest, NOW))
+    mongodb_dump.run_tasks("backup", tasks, 1, mongodb_dump.ConnectionLimiter(1))
+
+    recorded = {k: (e["count"], e["last_id"]) for k, e in manifest.entries.items()}
+    assert recorded["blog.cards/20240110"] == (2, str(oid(10, 7)))
+    assert recorded["blog.cards/20240111"] == (1, str(oid(11, 1)))
+
+
+def test_interrupted_backups_resume_with_the_failed_ranges(db, tmp_path):
+    manifest_path = tmp_path / mongodb_dump.MANIFEST_NAME
+    back_up(
+        db,
+        mongodb_dump.BackupManifest(manifest_path),
+        tmp_path / "run-1",
+        fail={"export-categories"},
+    )
+
+    manifest = mongodb_dump.BackupManifest(manifest_path)
+    assert "blog.categories/20240108" not in manifest.entries
+    pending = back_up(db, manifest, tmp_path / "run-2")
+    assert planned(pending) == [
+        ("cards", 8, True),
+        ("cards", 10, False),
+        ("cards", 11, False),
+        ("categories", 8, True),
+    ]
+
+    # manifests of an older version may hold frozen retention days
+    manifest_path.write_text(json.dumps(dict(version=1, entries=manifest.entries)))
+    assert mongodb_dump.BackupManifest(manifest_path).entries == {}
+
+
+def test_adjacent_periods_group_runs_without_gaps(tmp_path):
+    days = periods(tmp_path)
+    groups = mongodb_dump.adjacent_periods([days[3], days[1], days[0]])
+    assert [[p.backup_start.day for p in group] for group in groups] == [
+        [8],
+        [10, 11],
+    ]
+
+
+def test_restores_only_retention_ranges_of_this_run(db, tmp_path):
+    manifest = mongodb_dump.BackupManifest(tmp_path / mongodb_dump.MANIFEST_NAME)
+    pending = back_up(db, manifest, tmp_path / "run-1")
+
+    tasks = list(mongodb_dump.restore_tasks(pending, "blog"))
+    assert [task.name for task in tasks] == ["retention-0-cards", "retention-1-cards"]
+    assert tasks[0].context["backup_dir"] == str(
+        (tmp_path / "run-1" / "retention-20240110" / "blog").absolute()
+    )
+
+
+def test_index_models_round_trip_text_indexes():
+    listed = [
+        {"v": 2, "key": {"_id": 1}, "name": "_id_"},
+        {
+            "v": 2,
+            "key": {"author": 1, "created_at": -1, "_id": -1},
+            "name": "author_created_at",
+        },
+        {
+            "v": 2,
+            "key": {"_fts": "text", "_ftsx": 1, "status": 1},
+            "name": "name_content_text",
+            "weights": {"content": 1, "name": 3},
+            "default_language": "english",
+            "language_override": "language",
+            "textIndexVersion": 3,
+        },
+    ]
+    models = [model.document for model in mongodb_dump.index_models(listed)]
+
+    assert [list(model["key"].items()) for model in models] == [
+        [("author", 1), ("created_at", -1), ("_id", -1)],
+        [("content", "text"), ("name", "text"), ("status", 1)],
+    ]
+    assert models[1]["weights"] == {"content": 1, "name": 3}
+    assert models[1]["textIndexVersion"] == 3
+    assert "v" not in models[1]
+
+
+def test_swap_collection_keeps_writes_made_after_the_backup(db):
+    cards = db.cards
+    cards.create_index([("day", 1)], name="day_1")
+    backed_up = list(cards.find({"_id": {"$gte": ObjectId.from_datetime(CUTOFF)}}))
+    db["cards__restore"].insert_many(backed_up)
+
+    # an update, a delete and an insert after the backup
+    cards.update_one(
+        {"_id": oid(10, 3)}, {"$set": {"day": 0, "updated_at": datetime.utcnow()}}
+    )
+    cards.delete_one({"_id": oid(11, 1)})
+    cards.insert_one(dict(_id=oid(11, 9), day=11, updated_at=datetime.utcnow()))
+    live = list(cards.find({"_id": {"$gte": ObjectId.from_datetime(CUTOFF)}}))
+
+    changed_since = datetime.now(tz=pytz.utc) - timedelta(minutes=1)
+    r = mongodb_dump.swap_collection(db, "cards", CUTOFF, changed_since, 1)
+
+    assert r.returncode == 0, r.out
+    assert db.list_collection_names() == ["cards", "categories"]
+    # days before the retention cutoff are pruned
+    assert list(cards.find(sort=[("_id", 1)])) == live
+    assert "day_1" in cards.index_information()
@@ -0,0 +1,27 @@
+import json
+from datetime import datetime
+
+import bson
+from bson.objectid import ObjectId
+
+from mini_blog_api.models.card_model import Card
+from mini_blog_api.services.serializer import dumps
+
+from .dummy_data import card_payload
+
+
+def test_stored_document_matches_model_json():
+    doc = dict(
+        card_payload,
+        _id=ObjectId(),
+        category=ObjectId(card_payload["category"]),
+        author=ObjectId(),
+        created_at=datetime(2023, 8, 1, 12, 30, 15, 123000),
+        updated_at=datetime(2023, 8, 1, 12, 30, 15),
+    )
+    stored = bson.decode(bson.encode(doc))
+
+    encoded = json.loads(dumps({"cards": [stored], "next_cursor": None}))
+
+    expected = json.loads(Card.model_validate(doc).model_dump_json(by_alias=True))
+    assert encoded == {"cards": [expected], "next_cursor": None}
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from mini_blog_api.repositories.card_repository import CardRepository
+from mini_blog_api.services.singleflight import SingleFlight, render_metrics
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    executions = 0
+    release = asyncio.Event()
+
+    async def load():
+        nonlocal executions
+        executions += 1
+        await release.wait()
+        return {"value": executions}
+
+    callers = [asyncio.ensure_future(flight.do("key", load)) for _ in range(10)]
+    await asyncio.sleep(0)
+    callers[0].cancel()  # does not cancel the shared call for the others
+    release.set()
+
+    results = await asyncio.gather(*callers[1:])
+    assert executions == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == dict(calls=10, coalesced=9, inflight=0)
+
+    # finished calls are not reused
+    assert await flight.do("key", load) == {"value": 2}
+    assert 'singleflight_coalesced_total{group="test"} 9' in render_metrics()
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flight.stats()["inflight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_card_reads_are_coalesced(mock_db):
+    result = await mock_db["cards"].insert_one({"name": "viral"})
+    coalesced = CardRepository.flight.coalesced
+
+    docs = await asyncio.gather(
+        *(CardRepository.find_one_raw(_id=result.inserted_id) for _ in range(20))
+    )
+    assert all(doc["name"] == "viral" for doc in docs)
+    assert CardRepository.flight.coalesced - coalesced == 19